@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import Database
+from utils.models import UserSettings
+from utils.seen_filter import SeenFilter
+
+
+class PassThroughFilter(SeenFilter):
+    def might_contain(self, user_id: int, item_id: int) -> bool:
+        return True
+
+
+class PerCallDatabase(Database):
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _db(self):
+        return aiosqlite.connect(self.db_path)
+
+
+async def run(db: Database, ops: int) -> float:
+    await db.init_db()
+    db.seen_filter = PassThroughFilter()
+
+    start = time.perf_counter()
+    for user_id in range(ops // 4):
+        await db.save_user_settings(user_id, UserSettings(user_id, ["steam"], min_price=user_id))
+        db.settings_cache.clear()
+        await db.get_user_settings(user_id)
+        if not await db.is_item_seen(user_id, user_id):
+            await db.mark_item_seen(user_id, user_id)
+            await db.flush()
+    elapsed = time.perf_counter() - start
+
+    await db.close()
+    return ops / elapsed
+
+
+async def main():
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with tempfile.TemporaryDirectory() as tmp:
+        before = await run(PerCallDatabase(os.path.join(tmp, "per_call.db")), ops)
+        after = await run(Database(os.path.join(tmp, "persistent.db")), ops)
+    print(f"per-call connect: {before:8.0f} ops/s")
+    print(f"persistent + WAL: {after:8.0f} ops/s")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
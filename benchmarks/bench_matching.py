@@ -0,0 +1,118 @@
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import make_response
+from services.listing_parser import parse_accounts
+from services.query_planner import group_key
+from services.subscription_index import SubscriptionIndex
+from utils.account_batch import AccountBatch
+from utils.json_codec import iter_items
+from utils.models import UserSettings
+
+
+def _conditions(cat: str, settings: UserSettings) -> List[Tuple[str, str, Any]]:
+    conditions = []
+    if settings.min_price:
+        conditions.append(("price", ">=", settings.min_price))
+    if settings.max_price:
+        conditions.append(("price", "<=", settings.max_price))
+    if settings.nsb is not None:
+        conditions.append(("nsb", "is", settings.nsb))
+
+    if cat == "escape_from_tarkov":
+        if settings.min_level:
+            conditions.append(("level", ">=", settings.min_level))
+        if settings.max_level:
+            conditions.append(("level", "<=", settings.max_level))
+        if settings.pve_access in ("yes", "no"):
+            conditions.append(("pve_access", "is", settings.pve_access == "yes"))
+        if settings.game_versions:
+            conditions.append(("game_version", "in", frozenset(settings.game_versions)))
+        if settings.regions:
+            conditions.append(("region", "in", frozenset(settings.regions)))
+
+    if settings.origins:
+        conditions.append(("origin", "in", frozenset(settings.origins)))
+    return conditions
+
+
+def compile_batch_filter(cat: str, settings: UserSettings) -> Callable[[AccountBatch], List[int]]:
+    lines, parts, namespace = [], [], {}
+    for n, (name, op, value) in enumerate(_conditions(cat, settings)):
+        if name in AccountBatch.STRING_COLUMNS:
+            lines.append(f"{name} = b.{name}.codes")
+            lines.append(f"v{n} = frozenset(b.{name}.index[v] for v in values{n} if v in b.{name}.index)")
+            namespace[f"values{n}"] = value
+        else:
+            lines.append(f"{name} = b.{name}")
+
+        if op == "is":
+            parts.append(f"{name}[i]" if value else f"not {name}[i]")
+        else:
+            parts.append(f"{name}[i] {op} v{n}")
+            namespace.setdefault(f"v{n}", value)
+
+    expr = " and ".join(parts) or "True"
+    body = "".join(f"    {line}\n" for line in dict.fromkeys(lines))
+    exec(f"def select(b):\n{body}    return [i for i in range(len(b)) if {expr}]\n", namespace)
+    return namespace["select"]
+
+
+def random_settings(user_id: int, cat: str, width: int) -> UserSettings:
+    low = random.randint(500, 9000)
+    return UserSettings(
+        user_id, [cat],
+        min_price=low,
+        max_price=low + random.randint(width // 10, width),
+        game_versions=random.sample(["standard", "left_behind", "edge_of_darkness"], random.randint(0, 2)),
+        regions=random.sample(["eu", "cis", "us"], random.randint(0, 2)),
+        origins=random.sample(["brute", "personal", "resale"], random.randint(0, 2)),
+        min_level=random.choice([None, random.randint(1, 40)]),
+        max_level=random.choice([None, random.randint(30, 70)]),
+        nsb=random.choice([None, True, False]),
+        pve_access=random.choice([None, "yes", "no", "nomatter"])
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    raw = make_response(count)
+
+    for cat in ("escape_from_tarkov", "steam"):
+        batch = AccountBatch(parse_accounts(iter_items(raw), cat), cat)
+        members = [random_settings(user_id, cat, width) for user_id in range(users)]
+        index = SubscriptionIndex()
+        index.rebuild(members)
+        for settings in random.sample(members, users // 10):
+            settings.min_price = random.randint(500, 9000)
+            index.update(settings)
+        key = group_key(cat, members[0])
+
+        start = time.perf_counter()
+        selectors = {settings.user_id: compile_batch_filter(cat, settings) for settings in members}
+        compiled = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = {user_id: select(batch) for user_id, select in selectors.items()}
+        scanned = time.perf_counter() - start
+
+        start = time.perf_counter()
+        routed = index.route(key, batch)
+        indexed = time.perf_counter() - start
+
+        for user_id, indices in expected.items():
+            if indices != routed.get(user_id, []):
+                raise AssertionError(f"{cat} user {user_id}: index disagrees with compiled filter")
+        matches = sum(map(len, routed.values()))
+        print(f"{cat:20} compile {compiled * 1000:7.1f} ms  scan {scanned * 1000:8.1f} ms  "
+              f"index {indexed * 1000:8.1f} ms  {matches} matches")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import dataclasses
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import make_response
+from utils.account_batch import AccountBatch
+from utils.json_codec import iter_items
+from utils.models import TarkovAccount
+from services.listing_parser import parse_accounts
+
+
+LegacyAccount = dataclasses.make_dataclass(
+    "LegacyAccount", [(f.name, f.type) for f in dataclasses.fields(TarkovAccount)]
+)
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    accounts = parse_accounts(iter_items(make_response(count)), "escape_from_tarkov")
+    print(f"{count} listings")
+
+    builds = {
+        "dataclass": lambda: [LegacyAccount(**{f: getattr(acc, f) for f in acc.__slots__}) for acc in accounts],
+        "slots": lambda: [TarkovAccount(**{f: getattr(acc, f) for f in acc.__slots__}) for acc in accounts],
+        "batch": lambda: AccountBatch(accounts)
+    }
+    for name, build in builds.items():
+        size = measure(build)
+        print(f"{name:10} {size / count:8.0f} bytes/listing")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_codec import DECODERS, orjson
+from services.listing_parser import iter_accounts
+
+
+def make_response(count: int) -> bytes:
+    items = []
+    for i in range(count):
+        items.append({
+            "item_id": 100000 + i,
+            "title": f"Escape from Tarkov account #{i}",
+            "price": random.randint(500, 10000),
+            "priceWithSellerFee": random.randint(500, 10000) * 1.05,
+            "tarkov_game_version": random.choice(["standard", "left_behind", "edge_of_darkness"]),
+            "tarkov_level": random.randint(1, 70),
+            "tarkov_region": random.choice(["eu", "cis", "us"]),
+            "item_origin": random.choice(["brute", "personal", "resale"]),
+            "seller": {"username": f"seller{i % 50}", "sold_items_count": random.randint(0, 3000),
+                       "restore_percents": random.randint(0, 20)},
+            "tarkov_rubles": random.randint(0, 5000000),
+            "tarkov_dollars": random.randint(0, 5000),
+            "tarkov_euros": random.randint(0, 5000),
+            "nsb": random.randint(0, 1),
+            "allow_ask_discount": random.randint(0, 1),
+            "max_discount_percent": random.randint(0, 30),
+            "published_date": int(time.time()) - random.randint(0, 86400),
+            "tarkov_last_activity": int(time.time()) - random.randint(0, 864000),
+            "email_type": "market",
+            "email_provider": "other",
+            "tarkov_access_pve": random.randint(0, 1),
+            "description": "x" * 500
+        })
+    return json.dumps({"items": items, "totalItems": count, "perPage": count}).encode()
+
+
+def measure(name: str, raw: bytes, rounds: int):
+    decode = DECODERS[name]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in iter_accounts(decode(raw), "escape_from_tarkov"):
+            pass
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    for _ in iter_accounts(decode(raw), "escape_from_tarkov"):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    raw = make_response(count)
+    print(f"{count} items, {len(raw) / 1024:.0f} KiB body, {rounds} rounds")
+
+    names = ["json", "stream"] + (["orjson"] if orjson is not None else [])
+    for name in names:
+        elapsed, peak = measure(name, raw, rounds)
+        print(f"{name:8} {elapsed * 1000:8.1f} ms  {count / elapsed:10.0f} items/s  peak {peak / 1024 / 1024:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
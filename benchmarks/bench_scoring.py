@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import make_response
+from services.deal_analyzer import DealAnalyzer
+from services.listing_parser import parse_accounts
+from utils.account_batch import AccountBatch
+from utils.json_codec import iter_items
+from utils.models import UserSettings
+
+
+def check_parity(analyzer: DealAnalyzer, batch: AccountBatch, settings: UserSettings, now: int) -> int:
+    category = batch.category or analyzer._default_category(settings)
+    intrinsic, tarkov = analyzer.batch_scorer.intrinsic(batch, category)
+    indices = list(range(len(batch)))
+    batch_scores = analyzer.batch_scorer.user_scores(batch, settings, intrinsic, tarkov, now, indices)
+    for i, acc in enumerate(batch):
+        scalar = min(analyzer._calc_score(acc, settings, now, category)[0], 100)
+        if scalar != batch_scores[i]:
+            raise AssertionError(f"item {acc.item_id}: scalar {scalar} != batch {batch_scores[i]}")
+    return len(batch)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    analyzer = DealAnalyzer()
+    raw = make_response(count)
+    now = int(time.time())
+
+    checked = 0
+    for cat in ("escape_from_tarkov", "steam"):
+        batch = AccountBatch(parse_accounts(iter_items(raw), cat))
+        for categories in (["escape_from_tarkov"], ["steam"], ["gifts"], ["telegram", "steam"]):
+            settings = UserSettings(0, categories, max_discount_threshold=random.randint(0, 30))
+            checked += check_parity(analyzer, batch, settings, now)
+    for cat in ("escape_from_tarkov", "steam"):
+        accounts = parse_accounts(iter_items(raw), cat)
+        analyzer.price_index.observe(cat, accounts[:count // 2])
+        batch = AccountBatch(accounts, cat)
+        for categories in (["escape_from_tarkov"], ["steam"]):
+            settings = UserSettings(0, categories)
+            checked += check_parity(analyzer, batch, settings, now)
+    print(f"parity ok: {checked} scores")
+
+    accounts = parse_accounts(iter_items(raw), "escape_from_tarkov")
+    batch = AccountBatch(accounts)
+    settings = UserSettings(0, ["escape_from_tarkov"])
+    analyzer.score_cache.clear()
+    for name, run in (("scalar", lambda: analyzer.analyze_deals(accounts, settings)),
+                      ("scalar cached", lambda: analyzer.analyze_deals(accounts, settings)),
+                      ("batch", lambda: analyzer.analyze_batch(batch, settings)),
+                      ("batch cached", lambda: analyzer.analyze_batch(batch, settings))):
+        start = time.perf_counter()
+        deals = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:14} {elapsed * 1000:8.1f} ms  {count / elapsed:10.0f} listings/s  {len(deals)} deals")
+
+
+if __name__ == '__main__':
+    main()
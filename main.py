@@ -1,5 +1,8 @@
 import asyncio
 import logging
+import multiprocessing
+import os
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
@@ -8,7 +11,12 @@ from colorama import init, Fore, Style
 from utils.config import ConfigManager
 from utils.database import Database
 from services.lolz_api import LolzAPI
+from services.deal_analyzer import DealAnalyzer
+from services.delivery import DeliveryQueue
+from services.digest import DigestAggregator
 from services.monitoring import MonitoringService
+from services.poll_scheduler import AdaptivePoller
+from services.sharding import ShardCoordinator
 from utils.handlers import router
 
 init(autoreset=True)
@@ -27,24 +35,142 @@ class ColorFormatter(logging.Formatter):
         return super().format(record)
 
 
-async def main():
-    config = ConfigManager.get_config()
-    
+def setup_logging():
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     handler = logging.StreamHandler()
     handler.setFormatter(ColorFormatter('%(asctime)s - %(levelname)s - %(message)s'))
     logger.addHandler(handler)
+
+
+async def create_services(config, bot, share=1.0, shard_id=None):
+    db = Database(
+        config['database_path'], config['db_flush_rows'], config['db_flush_interval_ms'] / 1000,
+        config['seen_filter_fp_rate'], config['seen_filter_capacity'], config['settings_cache_size'],
+        config['notification_store_text']
+    )
+    await db.init_db(load_seen_filter=shard_id is None)
+    
+    api = LolzAPI(
+        config['lolz_api_token'],
+        connection_limit=max(1, round(config['http_connection_limit'] * share)),
+        dns_cache_ttl=config['http_dns_cache_ttl'],
+        keepalive_timeout=config['http_keepalive_timeout'],
+        request_timeout=config['http_request_timeout'],
+        connect_timeout=config['http_connect_timeout'],
+        requests_per_minute=config['api_requests_per_minute'] * share,
+        burst=config['api_burst'],
+        max_retries=config['api_max_retries'],
+        backoff_base=config['api_backoff_base'],
+        backoff_max=config['api_backoff_max'],
+        max_concurrency=max(1, round(config['api_max_concurrency'] * share)),
+        json_decoder=config['json_decoder']
+    )
+    await api.start()
+    analyzer = DealAnalyzer(config['score_cache_size'], config['score_cache_ttl'], config['price_index_min_samples'])
+    poller = None
+    if config['adaptive_polling']:
+        poller = AdaptivePoller(
+            config['check_interval_minutes'] * 60,
+            config['poll_min_interval_seconds'],
+            config['poll_max_interval_seconds'],
+            config['poll_requests_per_minute'] * share,
+            config['poll_target_new']
+        )
+    shard = None
+    if shard_id is not None:
+        shard = ShardCoordinator(
+            db, shard_id, config['shard_heartbeat_seconds'], config['shard_lease_seconds'], config['shard_ring_replicas']
+        )
+    monitoring = MonitoringService(
+        bot, db, api, config['check_interval_minutes'], config['api_max_pages'], analyzer,
+        config['notification_retention_days'], config['cleanup_batch_size'],
+        user_concurrency=config['monitor_user_concurrency'],
+        user_timeout=config['monitor_user_timeout'],
+        delivery=DeliveryQueue(
+            bot,
+            workers=config['delivery_workers'],
+            messages_per_second=config['telegram_messages_per_second'] * share,
+            per_chat_per_second=config['telegram_per_chat_per_second'],
+            max_retries=config['delivery_max_retries']
+        ),
+        poller=poller,
+        digests=DigestAggregator(config['digest_max_items'], config['digest_window_seconds']),
+        render_cache_size=config['render_cache_size'],
+        render_cache_ttl=config['render_cache_ttl'],
+        shard=shard
+    )
+    return db, api, monitoring
+
+
+async def close_services(bot, db, api, monitoring):
+    await monitoring.stop()
+    await api.close()
+    await db.close()
+    await bot.session.close()
+
+
+async def worker_main(config, index, stop_event):
+    bot = Bot(token=config['bot_token'], default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    db, api, monitoring = await create_services(
+        config, bot, 1 / (config['shard_workers'] + 1), f"worker-{index}"
+    )
+    print(f"{Fore.CYAN}Воркер {index} запущен (pid {os.getpid()})")
+    await monitoring.start()
+    
+    try:
+        while not stop_event.is_set():
+            await asyncio.sleep(1)
+    finally:
+        await close_services(bot, db, api, monitoring)
+
+
+def run_worker(config, index, stop_event):
+    setup_logging()
+    try:
+        asyncio.run(worker_main(config, index, stop_event))
+    except KeyboardInterrupt:
+        pass
+
+
+def spawn_worker(context, config, index, stop_event):
+    process = context.Process(
+        target=run_worker, args=(config, index, stop_event), name=f"worker-{index}", daemon=True
+    )
+    process.start()
+    return process
+
+
+async def supervise_workers(context, config, processes, stop_event):
+    while not stop_event.is_set():
+        await asyncio.sleep(config['shard_heartbeat_seconds'])
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stop_event.is_set():
+                print(f"{Fore.YELLOW}Воркер {index} завершился (код {process.exitcode}), перезапуск")
+                processes[index] = spawn_worker(context, config, index, stop_event)
+
+
+def stop_workers(processes, stop_event, timeout=15):
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+async def main():
+    config = ConfigManager.get_config()
+    setup_logging()
     
     bot = Bot(token=config['bot_token'], default=DefaultBotProperties(parse_mode=ParseMode.HTML))
     dp = Dispatcher()
     dp.include_router(router)
     
-    db = Database(config['database_path'])
-    await db.init_db()
-    
-    api = LolzAPI(config['lolz_api_token'])
-    monitoring = MonitoringService(bot, db, api, config['check_interval_minutes'])
+    workers = config['shard_workers']
+    sharded = workers > 1
+    db, api, monitoring = await create_services(config, bot, 1 / (workers + 1) if sharded else 1.0)
     
     dp['db'] = db
     dp['api'] = api
@@ -53,13 +179,25 @@ async def main():
     print(f"{Fore.CYAN}Lolz Market Deal Finder запущен!")
     print(f"{Fore.BLUE}Интервал: {config['check_interval_minutes']} мин")
     
-    await monitoring.start()
+    processes = []
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    supervisor = None
+    if sharded:
+        print(f"{Fore.BLUE}Воркеров мониторинга: {workers}")
+        processes = [spawn_worker(context, config, index, stop_event) for index in range(workers)]
+        supervisor = asyncio.create_task(supervise_workers(context, config, processes, stop_event))
+    await monitoring.start(schedule=not sharded)
     
     try:
         await dp.start_polling(bot)
     finally:
-        await monitoring.stop()
-        await bot.session.close()
+        if supervisor:
+            stop_event.set()
+            supervisor.cancel()
+            await asyncio.gather(supervisor, return_exceptions=True)
+            await asyncio.to_thread(stop_workers, processes, stop_event)
+        await close_services(bot, db, api, monitoring)
 
 
 if __name__ == '__main__':
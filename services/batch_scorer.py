@@ -0,0 +1,121 @@
+from typing import Dict, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.account_batch import AccountBatch
+from utils.models import UserSettings
+from services.price_index import PriceIndex
+
+
+class BatchScorer:
+    PREMIUM_VERSIONS = ("edge_of_darkness", "unheard_edition")
+
+    def __init__(self, avg_prices: Dict[str, Dict[str, float]], level_multipliers: Dict[range, float],
+                 price_index: PriceIndex):
+        self.avg_prices = avg_prices
+        self.level_multipliers = level_multipliers
+        self.price_index = price_index
+
+    def intrinsic(self, batch: AccountBatch, category: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        price = np.asarray(batch.price, dtype=np.float64)
+        level = np.asarray(batch.level)
+        rubles = np.asarray(batch.rubles)
+        nsb = np.asarray(batch.nsb).astype(bool)
+        versions = np.asarray(batch.game_version.codes)
+        if category == "escape_from_tarkov":
+            tarkov = np.ones(len(batch), dtype=bool)
+        else:
+            tarkov = self._lookup(batch, versions, bool, False)
+
+        expected = self._expected_prices(batch, tarkov, versions, level, rubles, nsb, category)
+        ratio = np.divide(price, expected, out=np.full(len(batch), np.inf), where=expected > 0)
+        score = np.select([ratio < 0.7, ratio < 0.8, ratio < 0.9], [30.0, 20.0, 10.0], 0.0)
+
+        tarkov_terms = self._tarkov_terms(batch, versions, level, rubles)
+        generic_terms = self._generic_terms(batch, nsb)
+        for tarkov_term, generic_term in zip(tarkov_terms, generic_terms):
+            score += np.where(tarkov, tarkov_term, generic_term)
+        return score, tarkov
+
+    def user_scores(self, batch: AccountBatch, settings: UserSettings, intrinsic: "np.ndarray",
+                    tarkov: "np.ndarray", now: int, indices: "np.ndarray") -> "np.ndarray":
+        score = intrinsic[indices]
+        generic = ~tarkov[indices]
+
+        discount = np.asarray(batch.max_discount_percent)[indices]
+        can_discount = np.asarray(batch.allow_ask_discount)[indices].astype(bool) & (discount > settings.max_discount_threshold)
+        score = score + np.where(generic & can_discount, np.minimum(discount * 0.3, 15), 0.0)
+
+        hours = (now - np.asarray(batch.published_date)[indices]) / 3600
+        fresh = np.select([hours < 1, hours < 6, hours < 24], [8.0, 5.0, 3.0], 0.0)
+        score = score + np.where(generic, fresh, 0.0)
+        return np.minimum(score, 100)
+
+    @staticmethod
+    def _lookup(batch: AccountBatch, versions, func, default):
+        values = batch.game_version.values
+        if not values:
+            return np.full(len(batch), default)
+        return np.array([func(v) for v in values])[versions]
+
+    def _expected_prices(self, batch, tarkov, versions, level, rubles, nsb, category):
+        tarkov_prices = self.avg_prices["escape_from_tarkov"]
+        base = self._lookup(batch, versions, lambda v: float(tarkov_prices.get(v, 2000)), 2000.0)
+
+        mult = np.ones(len(batch))
+        for level_range, value in self.level_multipliers.items():
+            mult[(level >= level_range.start) & (level < level_range.stop)] = value
+        base = base * mult
+        base = np.where(rubles > 1000000, base + (rubles / 100000) * 50, base)
+        base = np.where(nsb, base * 1.1, base)
+
+        default = self.avg_prices.get(category, {}).get("default", 500)
+        expected = np.where(tarkov, base, float(default))
+        if not self.price_index.buckets:
+            return expected
+        return self._apply_index(batch, expected, tarkov, versions, level, category)
+
+    def _apply_index(self, batch, expected, tarkov, versions, level, category):
+        regions = np.asarray(batch.region.codes, dtype=np.int64)
+        level_bucket = np.minimum(np.maximum(level, 0) // 10, 5)
+        keys = np.where(tarkov, (versions.astype(np.int64) * 6 + level_bucket) * 65536 + regions, -1)
+        unique, inverse = np.unique(keys, return_inverse=True)
+
+        medians = np.full(len(unique), np.nan)
+        for n, key in enumerate(unique):
+            if key < 0:
+                bucket = self.price_index.bucket(category)
+            else:
+                code, region = divmod(int(key), 65536)
+                version, level_code = divmod(code, 6)
+                bucket = ("escape_from_tarkov", batch.game_version.values[version],
+                          level_code, batch.region.values[region])
+            median = self.price_index.median(bucket)
+            if median is not None:
+                medians[n] = median
+
+        indexed = medians[inverse]
+        return np.where(np.isnan(indexed), expected, indexed)
+
+    def _tarkov_terms(self, batch, versions, level, rubles):
+        currency = (np.asarray(batch.dollars) > 1000) | (np.asarray(batch.euros) > 1000)
+        premium = self._lookup(batch, versions, lambda v: v in self.PREMIUM_VERSIONS, False)
+        return [
+            np.where(level > 0, np.minimum(level * 0.5, 15), 0.0),
+            np.where(rubles > 500000, np.minimum((rubles / 100000) * 2, 15), 0.0),
+            np.where(currency, 8.0, 0.0),
+            np.where(np.asarray(batch.pve_access).astype(bool), 5.0, 0.0),
+            np.where(premium, 8.0, 0.0)
+        ]
+
+    def _generic_terms(self, batch, nsb):
+        sold = np.asarray(batch.seller_sold_items)
+        restore = np.asarray(batch.seller_restore_percent)
+        trust = np.select([sold > 1000, sold > 500, sold > 100], [8.0, 5.0, 3.0], 0.0)
+        trust = trust + np.select([(restore >= 0) & (restore <= 5), (restore >= 0) & (restore <= 10)], [5.0, 2.0], 0.0)
+
+        zeros = np.zeros(len(batch))
+        return [np.where(nsb, 12.0, 0.0), np.minimum(trust, 10), zeros, zeros, zeros]
@@ -1,10 +1,15 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from utils.models import TarkovAccount, DealAlert, UserSettings, GAME_VERSION_NAMES, CATEGORIES
+from utils.account_batch import AccountBatch
+from utils.cache import TTLCache
+from services.batch_scorer import BatchScorer, np
+from services.price_index import PriceIndex
 import time
+import weakref
 
 
 class DealAnalyzer:
-    def __init__(self):
+    def __init__(self, cache_size: int = 50000, cache_ttl: float = 3600, min_samples: int = 20):
         self.avg_prices = {
             "escape_from_tarkov": {
                 "standard": 1800, "left_behind": 2500, "prepare_for_escape": 3200,
@@ -25,25 +30,81 @@ class DealAnalyzer:
             range(0, 10): 1.0, range(10, 20): 1.1, range(20, 30): 1.2,
             range(30, 40): 1.3, range(40, 50): 1.4, range(50, 100): 1.5
         }
+        self.price_index = PriceIndex(min_samples)
+        self.batch_scorer = BatchScorer(self.avg_prices, self.level_multipliers, self.price_index)
+        self.score_cache = TTLCache(cache_size, cache_ttl)
+        self._batch_cache: "weakref.WeakKeyDictionary[AccountBatch, Dict]" = weakref.WeakKeyDictionary()
     
     def analyze_deals(self, accounts: List[TarkovAccount], settings: UserSettings) -> List[DealAlert]:
         deals = []
+        now = int(time.time())
         for account in accounts:
-            score, reasons = self._calc_score(account, settings)
+            score, reasons = self._calc_score(account, settings, now)
             score = min(score, 100) 
             if score >= 60:
                 deals.append(DealAlert(
                     account=account,
                     reason="; ".join(reasons),
                     score=score,
-                    discount_potential=self._calc_discount(account)
+                    discount_potential=self._calc_discount(account),
+                    category=self._get_category(account, settings)
                 ))
         return sorted(deals, key=lambda x: x.score, reverse=True)
     
-    def _calc_score(self, acc: TarkovAccount, settings: UserSettings) -> Tuple[float, List[str]]:
-        score, reasons = 0.0, []
-        category = self._get_category(acc, settings)
+    def analyze_batch(self, batch: AccountBatch, settings: UserSettings,
+                      indices: Optional[Sequence[int]] = None) -> List[DealAlert]:
+        if indices is None:
+            indices = range(len(batch))
+        if np is None or not len(indices):
+            return self.analyze_deals([batch.account(i) for i in indices], settings)
+        
+        now = int(time.time())
+        category = batch.category or self._default_category(settings)
+        intrinsic = self._batch_cache.setdefault(batch, {})
+        if category not in intrinsic:
+            intrinsic[category] = self.batch_scorer.intrinsic(batch, category)
+        
+        indices = np.asarray(indices, dtype=np.intp)
+        scores = self.batch_scorer.user_scores(batch, settings, *intrinsic[category], now, indices)
+        deals = []
+        for pos in np.flatnonzero(scores >= 60):
+            account = batch.account(int(indices[pos]))
+            _, reasons = self._calc_score(account, settings, now, category)
+            deals.append(DealAlert(
+                account=account,
+                reason="; ".join(reasons),
+                score=float(scores[pos]),
+                discount_potential=self._calc_discount(account),
+                category=self._get_category(account, settings, category)
+            ))
+        return sorted(deals, key=lambda x: x.score, reverse=True)
+    
+    def _calc_score(self, acc: TarkovAccount, settings: UserSettings, now: int = None,
+                    default_category: str = None) -> Tuple[float, List[str]]:
+        category = self._get_category(acc, settings, default_category)
         expected = self._get_expected_price(acc, category)
+        key = (acc.item_id, acc.price, category, expected)
+        cached = self.score_cache.get(key)
+        if cached is None:
+            cached = self._calc_intrinsic(acc, category, expected)
+            self.score_cache.set(key, cached)
+        
+        score, reasons = cached[0], list(cached[1])
+        if category != "escape_from_tarkov":
+            if acc.allow_ask_discount and acc.max_discount_percent > settings.max_discount_threshold:
+                score += min(acc.max_discount_percent * 0.3, 15)
+                reasons.append(f"Возможна скидка до {acc.max_discount_percent}%")
+            fresh_score = self._calc_freshness(acc, now)
+            score += fresh_score
+            if fresh_score > 3:
+                reasons.append("Свежее предложение")
+        return score, reasons
+    
+    def _calc_intrinsic(self, acc: TarkovAccount, category: str,
+                        expected: Optional[float] = None) -> Tuple[float, Tuple[str, ...]]:
+        score, reasons = 0.0, []
+        if expected is None:
+            expected = self._get_expected_price(acc, category)
 
         if expected > 0:
             ratio = acc.price / expected
@@ -81,28 +142,28 @@ class DealAnalyzer:
             if acc.nsb:
                 score += 12
                 reasons.append("Не продавался ранее")
-            if acc.allow_ask_discount and acc.max_discount_percent > settings.max_discount_threshold:
-                score += min(acc.max_discount_percent * 0.3, 15)
-                reasons.append(f"Возможна скидка до {acc.max_discount_percent}%")
             trust_score = self._calc_trust(acc)
             score += trust_score
             if trust_score > 5:
                 reasons.append("Надежный продавец")
-            fresh_score = self._calc_freshness(acc)
-            score += fresh_score
-            if fresh_score > 3:
-                reasons.append("Свежее предложение")
-        return score, reasons
+        return score, tuple(reasons)
     
-    def _get_category(self, acc: TarkovAccount, settings: UserSettings) -> str:
+    def _get_category(self, acc: TarkovAccount, settings: UserSettings, default: str = None) -> str:
         if acc.game_version:
             return "escape_from_tarkov"
+        return default or self._default_category(settings)
+    
+    def _default_category(self, settings: UserSettings) -> str:
         for cat in settings.categories:
             if cat in self.avg_prices:
                 return cat
         return "default"
     
     def _get_expected_price(self, acc: TarkovAccount, category: str) -> float:
+        indexed = self.price_index.median(self.price_index.bucket(category, acc.game_version, acc.level, acc.region))
+        if indexed is not None:
+            return indexed
+        
         if category == "escape_from_tarkov":
             base = self.avg_prices["escape_from_tarkov"].get(acc.game_version, 2000)
             
@@ -134,8 +195,8 @@ class DealAnalyzer:
                 score += 2
         return min(score, 10)
     
-    def _calc_freshness(self, acc: TarkovAccount) -> float:
-        hours = (int(time.time()) - acc.published_date) / 3600
+    def _calc_freshness(self, acc: TarkovAccount, now: int = None) -> float:
+        hours = ((now or int(time.time())) - acc.published_date) / 3600
         if hours < 1:
             return 8
         elif hours < 6:
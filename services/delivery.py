@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import InlineKeyboardMarkup
+
+from services.rate_limiter import TokenBucket
+from utils.cache import TTLCache
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass(order=True)
+class Delivery:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    reply_markup: Optional[InlineKeyboardMarkup] = field(default=None, compare=False)
+    keys: Tuple[Hashable, ...] = field(default=(), compare=False)
+    on_sent: Optional[Callable[[], Awaitable[None]]] = field(default=None, compare=False)
+    enqueued: float = field(default=0.0, compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class DeliveryQueue:
+    PRIORITY_HIGH = -1000
+
+    def __init__(self, bot: Bot, workers: int = 8, messages_per_second: float = 25,
+                 per_chat_per_second: float = 1, max_retries: int = 3,
+                 backoff_base: float = 1.0, backoff_max: float = 30):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.limiter = TokenBucket(messages_per_second, messages_per_second)
+        self.per_chat_per_second = per_chat_per_second
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue: "asyncio.PriorityQueue[Delivery]" = asyncio.PriorityQueue()
+        self.pending: Set[Hashable] = set()
+        self._chats = TTLCache(10000, 60)
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._latencies: deque = deque(maxlen=1000)
+        self._deferred = 0
+        self.stats = {"enqueued": 0, "sent": 0, "failed": 0, "retries": 0, "throttled": 0}
+        self.settle_listeners: List[Callable[[Tuple[Hashable, ...], bool], None]] = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Не доставлено сообщений: {self.queue.qsize() + self._deferred}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _drain(self):
+        while True:
+            await self.queue.join()
+            if not self._deferred:
+                return
+            await asyncio.sleep(0.1)
+
+    def add_settle_listener(self, listener: Callable[[Tuple[Hashable, ...], bool], None]):
+        self.settle_listeners.append(listener)
+    
+    def is_pending(self, key: Hashable) -> bool:
+        return key in self.pending
+
+    def enqueue(self, chat_id: int, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                priority: int = 0, keys: Iterable[Hashable] = (),
+                on_sent: Optional[Callable[[], Awaitable[None]]] = None) -> bool:
+        keys = tuple(keys)
+        if any(key in self.pending for key in keys):
+            return False
+        self.pending.update(keys)
+        self.queue.put_nowait(Delivery(
+            priority, next(self._seq), chat_id, text, reply_markup, keys, on_sent, time.monotonic()
+        ))
+        self.stats["enqueued"] += 1
+        return True
+
+    def _chat_limiter(self, chat_id: int) -> TokenBucket:
+        limiter = self._chats.get(chat_id)
+        if limiter is None:
+            limiter = TokenBucket(self.per_chat_per_second, 1)
+        self._touch_chat(chat_id, limiter)
+        return limiter
+    
+    def _touch_chat(self, chat_id: int, limiter: TokenBucket):
+        blocked = max(0.0, limiter.blocked_until - time.monotonic())
+        self._chats.set(chat_id, limiter, self._chats.ttl + blocked)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self._deliver(item)
+            except Exception as e:
+                print(f"Ошибка отправки уведомления {item.chat_id}: {e}")
+                self.stats["failed"] += 1
+                self._finish(item, isinstance(e, TelegramAPIError))
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, item: Delivery):
+        chat = self._chat_limiter(item.chat_id)
+        wait = chat.try_acquire()
+        if wait > 0:
+            self._defer(item, wait)
+            return
+        await self.limiter.acquire()
+        item.attempts += 1
+        try:
+            await self.bot.send_message(
+                chat_id=item.chat_id, text=item.text, parse_mode="HTML",
+                reply_markup=item.reply_markup, disable_web_page_preview=True
+            )
+        except TelegramRetryAfter as e:
+            self.stats["throttled"] += 1
+            chat.block(e.retry_after)
+            self._touch_chat(item.chat_id, chat)
+            self._retry(item, e.retry_after, e)
+            return
+        except (TelegramNetworkError, TelegramServerError) as e:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (item.attempts - 1))
+            self._retry(item, delay * random.uniform(0.5, 1.0), e)
+            return
+
+        self.stats["sent"] += 1
+        self._latencies.append(time.monotonic() - item.enqueued)
+        try:
+            if item.on_sent:
+                await item.on_sent()
+        except Exception as e:
+            print(f"Ошибка сохранения уведомления {item.chat_id}: {e}")
+        finally:
+            self._finish(item, True)
+
+    def _retry(self, item: Delivery, delay: float, error: Exception):
+        if item.attempts > self.max_retries:
+            print(f"Ошибка отправки уведомления {item.chat_id}: {error}")
+            self.stats["failed"] += 1
+            self._finish(item, False)
+            return
+        self.stats["retries"] += 1
+        self._defer(item, delay)
+
+    def _defer(self, item: Delivery, delay: float):
+        self._deferred += 1
+        asyncio.get_running_loop().call_later(delay, self._requeue, item)
+
+    def _requeue(self, item: Delivery):
+        self._deferred -= 1
+        self.queue.put_nowait(item)
+
+    def _finish(self, item: Delivery, done: bool):
+        self.pending.difference_update(item.keys)
+        for listener in self.settle_listeners:
+            listener(item.keys, done)
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = list(self._latencies)
+        return {
+            **self.stats,
+            "depth": self.queue.qsize(),
+            "deferred": self._deferred,
+            "pending": len(self.pending),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p99": percentile(latencies, 0.99)
+        }
@@ -0,0 +1,48 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.models import DealAlert, UserSettings
+
+
+class DigestBuffer:
+    __slots__ = ("settings", "deals", "started")
+
+    def __init__(self, settings: UserSettings, started: float):
+        self.settings = settings
+        self.deals: Dict[int, DealAlert] = {}
+        self.started = started
+
+
+class DigestAggregator:
+    def __init__(self, max_items: int = 10, window: float = 0):
+        self.max_items = max(1, max_items)
+        self.window = window
+        self.buffers: Dict[int, DigestBuffer] = {}
+
+    def add(self, settings: UserSettings, deals: List[DealAlert], now: Optional[float] = None):
+        if not deals:
+            return
+        now = time.monotonic() if now is None else now
+        buffer = self.buffers.get(settings.user_id)
+        if buffer is None:
+            buffer = self.buffers[settings.user_id] = DigestBuffer(settings, now)
+        buffer.settings = settings
+        for deal in deals:
+            current = buffer.deals.get(deal.account.item_id)
+            if current is None or deal.score > current.score:
+                buffer.deals[deal.account.item_id] = deal
+
+    def contains(self, user_id: int, item_id: int) -> bool:
+        buffer = self.buffers.get(user_id)
+        return buffer is not None and item_id in buffer.deals
+
+    def pop_due(self, now: Optional[float] = None, force: bool = False) -> List[Tuple[UserSettings, List[DealAlert]]]:
+        now = time.monotonic() if now is None else now
+        ready = []
+        for user_id, buffer in list(self.buffers.items()):
+            if force or len(buffer.deals) >= self.max_items or now - buffer.started >= self.window:
+                del self.buffers[user_id]
+                deals = sorted(buffer.deals.values(), key=lambda deal: deal.score, reverse=True)
+                for start in range(0, len(deals), self.max_items):
+                    ready.append((buffer.settings, deals[start:start + self.max_items]))
+        return ready
@@ -0,0 +1,78 @@
+from typing import Any, Dict, Iterable, Iterator, List
+
+from utils.models import TarkovAccount
+
+
+def iter_accounts(items: Iterable[Dict[str, Any]], cat: str) -> Iterator[TarkovAccount]:
+    parse = parse_tarkov if cat == "escape_from_tarkov" else parse_generic
+    for item in items:
+        try:
+            yield parse(item)
+        except Exception as e:
+            print(f"Parse error {item.get('item_id', 'unknown')} for {cat}: {e}")
+
+
+def parse_accounts(items: Iterable[Dict[str, Any]], cat: str) -> List[TarkovAccount]:
+    return list(iter_accounts(items, cat))
+
+
+def parse_tarkov(item: Dict[str, Any]) -> TarkovAccount:
+    get = item.get
+    seller = get('seller') or {}
+    item_id = get('item_id', 0)
+    return TarkovAccount(
+        item_id=item_id,
+        title=get('title', ''),
+        price=get('price', 0),
+        price_with_seller_fee=get('priceWithSellerFee', 0),
+        game_version=get('tarkov_game_version', ''),
+        level=get('tarkov_level', 0),
+        region=get('tarkov_region', ''),
+        origin=get('item_origin', ''),
+        seller_username=seller.get('username', ''),
+        seller_sold_items=seller.get('sold_items_count', 0),
+        seller_restore_percent=seller.get('restore_percents'),
+        rubles=get('tarkov_rubles', 0),
+        dollars=get('tarkov_dollars', 0),
+        euros=get('tarkov_euros', 0),
+        nsb=get('nsb', 0) == 1,
+        allow_ask_discount=get('allow_ask_discount', 0) == 1,
+        max_discount_percent=get('max_discount_percent', 0),
+        published_date=get('published_date', 0),
+        last_activity=get('tarkov_last_activity', 0),
+        email_type=get('email_type', ''),
+        email_provider=get('email_provider', ''),
+        pve_access=get('tarkov_access_pve', 0) == 1,
+        url=f"https://lzt.market/{item_id}/"
+    )
+
+
+def parse_generic(item: Dict[str, Any]) -> TarkovAccount:
+    get = item.get
+    seller = get('seller') or {}
+    item_id = get('item_id', 0)
+    return TarkovAccount(
+        item_id=item_id,
+        title=get('title', ''),
+        price=get('price', 0),
+        price_with_seller_fee=get('priceWithSellerFee', 0),
+        game_version='',
+        level=0,
+        region='',
+        origin=get('item_origin', ''),
+        seller_username=seller.get('username', ''),
+        seller_sold_items=seller.get('sold_items_count', 0),
+        seller_restore_percent=seller.get('restore_percents'),
+        rubles=0,
+        dollars=0,
+        euros=0,
+        nsb=get('nsb', 0) == 1,
+        allow_ask_discount=get('allow_ask_discount', 0) == 1,
+        max_discount_percent=get('max_discount_percent', 0),
+        published_date=get('published_date', 0),
+        last_activity=0,
+        email_type=get('email_type', ''),
+        email_provider=get('email_provider', ''),
+        pve_access=False,
+        url=f"https://lzt.market/{item_id}/"
+    )
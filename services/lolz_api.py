@@ -1,43 +1,214 @@
 import aiohttp
 import asyncio
-from typing import List, Optional, Dict, Any
+import random
+from typing import List, Optional, Dict, Any, Tuple
 from utils.models import TarkovAccount, UserSettings, CATEGORIES
+from utils.json_codec import get_decoder
+from services.rate_limiter import TokenBucket
+from services.listing_parser import parse_accounts
+
+
+class LolzAPIError(Exception):
+    pass
 
 
 class LolzAPI:
     BASE_URL = "https://prod-api.lzt.market"
     
-    def __init__(self, token: str):
+    def __init__(self, token: str, connection_limit: int = 10, dns_cache_ttl: int = 300,
+                 keepalive_timeout: float = 30, request_timeout: float = 15, connect_timeout: float = 5,
+                 requests_per_minute: int = 120, burst: int = 3, max_retries: int = 3,
+                 backoff_base: float = 1.0, backoff_max: float = 30, max_concurrency: int = 4,
+                 json_decoder: str = "auto"):
         self.token = token
         self.headers = {"accept": "application/json", "authorization": f"Bearer {token}"}
+        self.connection_limit = connection_limit
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout, connect=connect_timeout)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.limiter = TokenBucket(requests_per_minute / 60, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.decoder = get_decoder(json_decoder)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {
+            "requests": 0, "coalesced": 0, "retries": 0, "throttled": 0,
+            "connections_created": 0, "connections_reused": 0
+        }
+        self.category_requests: Dict[str, int] = {}
+        self._queries: Dict[Tuple, asyncio.Future] = {}
+        self._tick_active = False
+    
+    async def start(self):
+        if self.session and not self.session.closed:
+            return
+        
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_create)
+        trace.on_connection_reuseconn.append(self._on_connection_reuse)
+        
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.connection_limit,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector, headers=self.headers,
+            timeout=self.timeout, trace_configs=[trace]
+        )
+    
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    async def _on_connection_create(self, session, ctx, params):
+        self.stats["connections_created"] += 1
+    
+    async def _on_connection_reuse(self, session, ctx, params):
+        self.stats["connections_reused"] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats["connections_created"] + self.stats["connections_reused"]
+        reuse_rate = self.stats["connections_reused"] / total if total else 0.0
+        return {**self.stats, "reuse_rate": reuse_rate, "limiter": self.limiter.get_stats()}
+    
+    def begin_tick(self):
+        self._queries.clear()
+        self._tick_active = True
+    
+    def end_tick(self):
+        self._tick_active = False
+        self._queries.clear()
     
     async def get_accounts_by_cat(self, cat: str, settings: UserSettings) -> List[TarkovAccount]:
         if cat not in CATEGORIES:
             return []
+        return await self._request(cat, self._build_params(cat, settings))
+    
+    async def get_new_accounts(self, cat: str, settings: UserSettings, mark: Optional[Tuple[int, int]] = None,
+                               max_pages: int = 5) -> Tuple[List[TarkovAccount], Optional[Tuple[int, int]]]:
+        if cat not in CATEGORIES:
+            return [], mark
         
-        url = f"{self.BASE_URL}/{CATEGORIES[cat]['endpoint']}"
         params = self._build_params(cat, settings)
+        params['order_by'] = 'pdate_to_down'
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers, params=params) as resp:
+        new_accounts = []
+        for page in range(1, max_pages + 1):
+            try:
+                accounts = await self._request(cat, {**params, 'page': page})
+            except LolzAPIError as e:
+                if page == 1:
+                    raise
+                print(f"API Error {cat}: страница {page} не получена ({e}), отметка не сдвинута")
+                return new_accounts, mark
+            if not accounts:
+                break
+            
+            fresh = [acc for acc in accounts if mark is None or (acc.published_date, acc.item_id) > mark]
+            new_accounts.extend(fresh)
+            if mark is None or len(fresh) < len(accounts):
+                break
+        else:
+            print(f"API {cat}: достигнут лимит {max_pages} стр. до отметки, часть объявлений пропущена")
+        
+        if new_accounts:
+            newest = max(new_accounts, key=lambda acc: (acc.published_date, acc.item_id))
+            mark = (newest.published_date, newest.item_id)
+        return new_accounts, mark
+    
+    async def _request(self, cat: str, params: Dict[str, Any]) -> List[TarkovAccount]:
+        endpoint = CATEGORIES[cat]['endpoint']
+        key = self._query_key(endpoint, params)
+        
+        future = self._queries.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(f"{self.BASE_URL}/{endpoint}", params, cat))
+            self._queries[key] = future
+            if not self._tick_active:
+                future.add_done_callback(lambda _: self._queries.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        
+        return list(await asyncio.shield(future))
+    
+    async def _fetch(self, url: str, params: Dict[str, Any], cat: str) -> List[TarkovAccount]:
+        if not self.session or self.session.closed:
+            await self.start()
+        
+        async with self._semaphore:
+            return await self._fetch_with_retries(url, params, cat)
+    
+    async def _fetch_with_retries(self, url: str, params: Dict[str, Any], cat: str) -> List[TarkovAccount]:
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                self.stats["requests"] += 1
+                self.category_requests[cat] = self.category_requests.get(cat, 0) + 1
+                async with self.session.get(url, params=params) as resp:
                     if resp.status == 200:
-                        data = await resp.json()
-                        return self._parse_accounts(data.get('items', []), cat)
-                    print(f"API Error {cat}: {resp.status}")
-                    return []
-        except Exception as e:
-            print(f"API Request Error {cat}: {e}")
-            return []
+                        raw = await resp.read()
+                        return parse_accounts(self.decoder(raw), cat)
+                    if resp.status != 429 and resp.status < 500:
+                        raise LolzAPIError(f"HTTP {resp.status}")
+                    
+                    delay = max(self._retry_after(resp) or 0.0, self._backoff(attempt))
+                    if resp.status == 429:
+                        self.stats["throttled"] += 1
+                        self.limiter.block(delay)
+                    print(f"API Error {cat}: {resp.status}, повтор через {delay:.1f} с")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = self._backoff(attempt)
+                print(f"API Request Error {cat}: {e!r}, повтор через {delay:.1f} с")
+            except LolzAPIError:
+                raise
+            except Exception as e:
+                raise LolzAPIError(str(e)) from e
+            
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+        raise LolzAPIError(f"попытки исчерпаны ({self.max_retries + 1})")
+    
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def _retry_after(self, resp: aiohttp.ClientResponse) -> Optional[float]:
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return float(value) + random.uniform(0, self.backoff_base)
+        except ValueError:
+            return None
     
     async def get_all_accounts(self, settings: UserSettings) -> List[TarkovAccount]:
+        results = await asyncio.gather(
+            *(self.get_accounts_by_cat(cat, settings) for cat in settings.categories),
+            return_exceptions=True
+        )
+        
         all_accounts = []
-        for cat in settings.categories:
-            accounts = await self.get_accounts_by_cat(cat, settings)
+        for cat, accounts in zip(settings.categories, results):
+            if isinstance(accounts, Exception):
+                print(f"API Request Error {cat}: {accounts}")
+                continue
             all_accounts.extend(accounts)
-            await asyncio.sleep(0.5)
         return all_accounts
     
+    @staticmethod
+    def _query_key(endpoint: str, params: Dict[str, Any]) -> Tuple:
+        items = []
+        for name in sorted(params):
+            value = params[name]
+            if isinstance(value, list):
+                value = tuple(sorted(value))
+            items.append((name, value))
+        return endpoint, tuple(items)
+    
     def _build_params(self, cat: str, settings: UserSettings) -> Dict[str, Any]:
         params = {}
         
@@ -77,72 +248,3 @@ class LolzAPI:
                 params.setdefault('origin[]', []).append(origin)
         
         return params
-    
-    def _parse_accounts(self, items: List[Dict[str, Any]], cat: str) -> List[TarkovAccount]:
-        accounts = []
-        for item in items:
-            try:
-                if cat == "escape_from_tarkov":
-                    acc = self._parse_tarkov(item)
-                else:
-                    acc = self._parse_generic(item)
-                
-                if acc:
-                    accounts.append(acc)
-            except Exception as e:
-                print(f"Parse error {item.get('item_id', 'unknown')} for {cat}: {e}")
-        return accounts
-    
-    def _parse_tarkov(self, item: Dict[str, Any]) -> Optional[TarkovAccount]:
-        return TarkovAccount(
-            item_id=item.get('item_id', 0),
-            title=item.get('title', ''),
-            price=item.get('price', 0),
-            price_with_seller_fee=item.get('priceWithSellerFee', 0),
-            game_version=item.get('tarkov_game_version', ''),
-            level=item.get('tarkov_level', 0),
-            region=item.get('tarkov_region', ''),
-            origin=item.get('item_origin', ''),
-            seller_username=item.get('seller', {}).get('username', ''),
-            seller_sold_items=item.get('seller', {}).get('sold_items_count', 0),
-            seller_restore_percent=item.get('seller', {}).get('restore_percents'),
-            rubles=item.get('tarkov_rubles', 0),
-            dollars=item.get('tarkov_dollars', 0),
-            euros=item.get('tarkov_euros', 0),
-            nsb=item.get('nsb', 0) == 1,
-            allow_ask_discount=item.get('allow_ask_discount', 0) == 1,
-            max_discount_percent=item.get('max_discount_percent', 0),
-            published_date=item.get('published_date', 0),
-            last_activity=item.get('tarkov_last_activity', 0),
-            email_type=item.get('email_type', ''),
-            email_provider=item.get('email_provider', ''),
-            pve_access=item.get('tarkov_access_pve', 0) == 1,
-            url=f"https://lzt.market/{item.get('item_id', 0)}/"
-        )
-    
-    def _parse_generic(self, item: Dict[str, Any]) -> Optional[TarkovAccount]:
-        return TarkovAccount(
-            item_id=item.get('item_id', 0),
-            title=item.get('title', ''),
-            price=item.get('price', 0),
-            price_with_seller_fee=item.get('priceWithSellerFee', 0),
-            game_version='',
-            level=0,
-            region='',
-            origin=item.get('item_origin', ''),
-            seller_username=item.get('seller', {}).get('username', ''),
-            seller_sold_items=item.get('seller', {}).get('sold_items_count', 0),
-            seller_restore_percent=item.get('seller', {}).get('restore_percents'),
-            rubles=0,
-            dollars=0,
-            euros=0,
-            nsb=item.get('nsb', 0) == 1,
-            allow_ask_discount=item.get('allow_ask_discount', 0) == 1,
-            max_discount_percent=item.get('max_discount_percent', 0),
-            published_date=item.get('published_date', 0),
-            last_activity=0,
-            email_type=item.get('email_type', ''),
-            email_provider=item.get('email_provider', ''),
-            pve_access=False,
-            url=f"https://lzt.market/{item.get('item_id', 0)}/"
-        )
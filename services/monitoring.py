@@ -1,80 +1,360 @@
 import asyncio
-from typing import List, Tuple
+import time
+from typing import Dict, List, Optional, Set, Tuple
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from utils.database import Database
 from services.lolz_api import LolzAPI
 from services.deal_analyzer import DealAnalyzer
+from services.delivery import DeliveryQueue, percentile
+from services.digest import DigestAggregator
+from services.poll_scheduler import AdaptivePoller
+from services.query_planner import QueryPlanner, group_key
+from services.sharding import ShardCoordinator
+from services.subscription_index import SubscriptionIndex
+from services.watermarks import MarkHold, WatermarkLedger
+from utils.account_batch import AccountBatch
+from utils.cache import TTLCache
 from utils.models import UserSettings, DealAlert, GAME_VERSION_NAMES, REGION_NAMES, ORIGIN_NAMES, CATEGORIES
 
 
 class MonitoringService:
-    def __init__(self, bot: Bot, db: Database, api: LolzAPI, interval: int = 5):
+    def __init__(self, bot: Bot, db: Database, api: LolzAPI, interval: int = 5, max_pages: int = 5,
+                 analyzer: Optional[DealAnalyzer] = None, notification_retention_days: int = 30,
+                 cleanup_batch_size: int = 500, user_concurrency: int = 8, user_timeout: float = 60,
+                 delivery: Optional[DeliveryQueue] = None, poller: Optional[AdaptivePoller] = None,
+                 digests: Optional[DigestAggregator] = None, render_cache_size: int = 5000,
+                 render_cache_ttl: float = 600, shard: Optional[ShardCoordinator] = None):
         self.bot = bot
         self.db = db
         self.api = api
-        self.analyzer = DealAnalyzer()
+        self.analyzer = analyzer or DealAnalyzer()
+        self.planner = QueryPlanner()
         self.scheduler = AsyncIOScheduler()
         self.interval = interval
+        self.max_pages = max_pages
+        self.notification_retention_days = notification_retention_days
+        self.cleanup_batch_size = cleanup_batch_size
+        self.user_concurrency = max(1, user_concurrency)
+        self.user_timeout = user_timeout
+        self.delivery = delivery or DeliveryQueue(bot)
+        self.digests = digests or DigestAggregator()
+        self.render_cache = TTLCache(render_cache_size, render_cache_ttl)
+        self.index = SubscriptionIndex()
+        self.poller = poller
+        self.shard = shard
+        self._shard_version = -1
+        self._owned: Set[int] = set()
+        self.tick_seconds = poller.min_interval if poller else interval * 60
+        self.tick_stats = {"ticks": 0, "overruns": 0, "missed": 0, "skipped": 0}
+        self.ledger = WatermarkLedger()
+        self.delivery.add_settle_listener(self.ledger.settle)
         self.running = False
     
-    async def start(self):
+    async def start(self, schedule: bool = True):
         if self.running:
             return
         
-        self.scheduler.add_job(self.check_deals, 'interval', minutes=self.interval, id='checker')
-        self.scheduler.add_job(self.cleanup, 'interval', hours=24, id='cleanup')
-        self.scheduler.start()
+        self.analyzer.price_index.load(await self.db.get_price_index())
+        self.delivery.start()
         self.running = True
-        print(f"Мониторинг запущен ({self.interval} мин)")
+        if not schedule:
+            return
+        
+        self.ledger.committed.update(await self.db.get_watermarks())
+        if self.shard:
+            await self.shard.start()
+        self.index.rebuild(self._owned_settings(await self.db.get_all_active_settings()))
+        self.db.add_settings_listener(self.index.update)
+        self.scheduler.add_job(
+            self.check_deals, 'interval', seconds=self.tick_seconds, id='checker',
+            max_instances=1, coalesce=True, misfire_grace_time=int(self.tick_seconds)
+        )
+        self.scheduler.add_job(self.cleanup, 'interval', hours=24, id='cleanup', max_instances=1, coalesce=True)
+        self.scheduler.add_listener(self._on_job_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+        self.scheduler.start()
+        if self.poller:
+            print(f"Мониторинг запущен (адаптивный опрос: тик {self.tick_seconds:.0f} с, "
+                  f"интервалы категорий {self.poller.min_interval:.0f}–{self.poller.max_interval:.0f} с)")
+        else:
+            print(f"Мониторинг запущен ({self.interval} мин)")
+    
+    def _on_job_event(self, event: JobEvent):
+        if event.job_id != 'checker':
+            return
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            self.tick_stats["skipped"] += 1
+            print("Пропуск проверки: предыдущая ещё выполняется")
+        else:
+            self.tick_stats["missed"] += 1
+            print(f"Проверка пропущена по расписанию ({event.scheduled_run_time:%H:%M:%S})")
     
     async def stop(self):
         if not self.running:
             return
-        self.scheduler.shutdown()
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+        await self._send_digests(force=True)
+        await self.delivery.stop()
+        await self.db.save_watermarks(self.ledger.ready())
+        if self.shard:
+            await self.shard.stop()
         self.running = False
         print("Мониторинг остановлен")
     
     async def check_deals(self):
         print("Проверка предложений...")
+        started = time.monotonic()
+        self.api.begin_tick()
+        coalesced = self.api.stats["coalesced"]
+        waited = self.api.limiter.stats["wait_time"]
+        holds: List[MarkHold] = []
         try:
-            users = await self.db.get_all_users()
-            for user_id in users:
-                settings = await self.db.get_user_settings(user_id)
-                if settings and settings.notifications_enabled:
-                    await self.check_user_deals(user_id, settings)
-                    await asyncio.sleep(1)
-            print(f"Проверено {len(users)} пользователей")
+            categories = await self.db.get_active_categories()
+            members: Dict[str, List[UserSettings]] = {}
+            if self.shard:
+                for category in categories:
+                    members[category] = self._owned_settings(await self.db.get_category_subscribers(category))
+                categories = [category for category in categories if members[category]]
+            if self.poller:
+                categories = self.poller.select(categories, self.tick_seconds)
+            
+            subscribers: Dict[int, UserSettings] = {}
+            plan = []
+            for category in categories:
+                if category not in members:
+                    members[category] = await self.db.get_category_subscribers(category)
+                subscribers.update((settings.user_id, settings) for settings in members[category])
+                plan.extend(self.planner.plan(members[category], [category]))
+            active = list(subscribers.values())
+            self.index.sync(active)
+            await self._refresh_owned(subscribers)
+            matched: Dict[int, List[Tuple[AccountBatch, List[int], Optional[MarkHold]]]] = {}
+            keys = [self._watermark_key(query.category, query.settings) for query in plan]
+            requests_before = dict(self.api.category_requests)
+            results = await asyncio.gather(
+                *(self.api.get_new_accounts(query.category, query.settings, self.ledger.get(key), self.max_pages)
+                  for query, key in zip(plan, keys)),
+                return_exceptions=True
+            )
+            
+            published: Dict[str, Dict[int, int]] = {category: {} for category in categories}
+            costs = {
+                query.category: self.api.category_requests.get(query.category, 0)
+                - requests_before.get(query.category, 0)
+                for query in plan
+            }
+            for query, key, result in zip(plan, keys, results):
+                if isinstance(result, Exception):
+                    print(f"Ошибка запроса {query.category}: {result}")
+                    continue
+                accounts, new_mark = result
+                published[query.category].update((acc.item_id, acc.published_date) for acc in accounts)
+                hold = None
+                if new_mark and new_mark != self.ledger.get(key):
+                    hold = self.ledger.hold(key, new_mark)
+                    holds.append(hold)
+                try:
+                    self.analyzer.price_index.observe(query.category, accounts)
+                    batch = AccountBatch(accounts, query.category)
+                    routed = self.index.route(group_key(query.category, query.settings), batch)
+                except Exception as e:
+                    print(f"Ошибка обработки выдачи {query.category}: {e}")
+                    if hold:
+                        hold.fail()
+                    continue
+                for user_id, indices in routed.items():
+                    if user_id in query.subscribers:
+                        matched.setdefault(user_id, []).append((batch, indices, hold))
+            
+            semaphore = asyncio.Semaphore(self.user_concurrency)
+            durations = await asyncio.gather(*(
+                self._process_user(semaphore, settings, matched[settings.user_id])
+                for settings in active if settings.user_id in matched
+            ))
+            await self._send_digests()
+            
+            self.ledger.close(holds)
+            await self.db.save_watermarks(self.ledger.ready())
+            price_rows = self.analyzer.price_index.dump_dirty()
+            if not self.shard or self.shard.owns('price_index'):
+                await self.db.save_price_index(price_rows)
+            await self.db.flush()
+            print(f"Проверено {len(active)} пользователей, запросов: {len(plan)} ({sum(costs.values())} HTTP), "
+                  f"объединено запросов: {self.api.stats['coalesced'] - coalesced}, "
+                  f"ожидание лимита: {self.api.limiter.stats['wait_time'] - waited:.1f} с")
+            connections = self.api.get_stats()
+            print(f"Соединения API: создано {connections['connections_created']}, "
+                  f"переиспользовано: {connections['reuse_rate']:.0%}")
+            if self.poller:
+                for category in costs:
+                    self.poller.record(category, published[category].values(), costs[category])
+            
+            elapsed = time.monotonic() - started
+            self.tick_stats["ticks"] += 1
+            print(f"Тик: {elapsed:.1f} с, категорий: {len(categories)}, пользователей с находками: {len(durations)}, "
+                  f"p50: {percentile(durations, 0.5):.2f} с, p99: {percentile(durations, 0.99):.2f} с")
+            render = self.render_cache.get_stats()
+            print(f"Кэш сообщений: {render['size']} записей, попаданий: {render['hit_rate']:.0%}")
+            delivery = self.delivery.get_stats()
+            print(f"Очередь отправки: {delivery['depth']}, отправлено: {delivery['sent']}, "
+                  f"задержка p50: {delivery['latency_p50']:.1f} с, p99: {delivery['latency_p99']:.1f} с")
+            if elapsed > self.tick_seconds:
+                self.tick_stats["overruns"] += 1
+                print(f"Проверка заняла {elapsed:.0f} с при интервале {self.tick_seconds:.0f} с "
+                      f"(превышений: {self.tick_stats['overruns']})")
         except Exception as e:
             print(f"Ошибка проверки: {e}")
+            for hold in holds:
+                hold.fail()
+            self.ledger.close(holds)
+        finally:
+            self.api.end_tick()
     
-    async def check_user_deals(self, user_id: int, settings: UserSettings):
-        try:
-            accounts = await self.api.get_all_accounts(settings)
-            if not accounts:
-                return
-            
-            deals = self.analyzer.analyze_deals(accounts, settings)
-            for deal in deals[:5]:
-                if not await self.db.is_item_seen(user_id, deal.account.item_id):
-                    await self.send_notification(user_id, deal, settings)
-                    await self.db.mark_item_seen(user_id, deal.account.item_id)
-                    await asyncio.sleep(0.5)
-        except Exception as e:
-            print(f"Ошибка для пользователя {user_id}: {e}")
+    def _owned_settings(self, users: List[UserSettings]) -> List[UserSettings]:
+        if not self.shard:
+            return users
+        return [settings for settings in users if self.shard.owns(settings.user_id)]
     
-    async def send_notification(self, user_id: int, deal: DealAlert, settings: UserSettings):
-        try:
-            msg, kb = self._format_msg(deal, settings)
-            await self.bot.send_message(
-                chat_id=user_id, text=msg, parse_mode="HTML",
-                reply_markup=kb, disable_web_page_preview=True
+    async def _refresh_owned(self, subscribers: Dict[int, UserSettings]):
+        if not self.shard:
+            return
+        if self.shard.version != self._shard_version:
+            self._shard_version = self.shard.version
+            released = [user_id for user_id in self._owned if not self.shard.owns(user_id)]
+            self.db.release_seen_filter(released)
+            self._owned.difference_update(released)
+            for user_id in released:
+                self.index.remove(user_id)
+        acquired = subscribers.keys() - self._owned
+        if acquired:
+            await self.db.refresh_seen_filter(list(acquired))
+            self._owned.update(acquired)
+    
+    def _watermark_key(self, category: str, settings: UserSettings) -> str:
+        key = ":".join(str(part) for part in group_key(category, settings))
+        return f"{self.shard.worker_id}:{key}" if self.shard else key
+    
+    async def _process_user(self, semaphore: asyncio.Semaphore, settings: UserSettings,
+                            selections: List[Tuple[AccountBatch, List[int], Optional[MarkHold]]]) -> float:
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    self.check_user_deals(settings.user_id, settings, selections), self.user_timeout
+                )
+            except asyncio.TimeoutError:
+                print(f"Превышено время обработки пользователя {settings.user_id}")
+                self._fail_holds(selections)
+            except Exception as e:
+                print(f"Ошибка для пользователя {settings.user_id}: {e}")
+                self._fail_holds(selections)
+            return time.monotonic() - started
+    
+    @staticmethod
+    def _fail_holds(selections: List[Tuple[AccountBatch, List[int], Optional[MarkHold]]]):
+        for _, _, hold in selections:
+            if hold:
+                hold.fail()
+    
+    async def check_user_deals(self, user_id: int, settings: UserSettings,
+                               selections: List[Tuple[AccountBatch, List[int], Optional[MarkHold]]]):
+        found: List[Tuple[DealAlert, Optional[MarkHold]]] = []
+        for batch, indices, hold in selections:
+            found.extend((deal, hold) for deal in self.analyzer.analyze_batch(batch, settings, indices))
+        found.sort(key=lambda x: x[0].score, reverse=True)
+        deals = []
+        for deal, hold in found:
+            key = (user_id, deal.account.item_id)
+            if self.delivery.is_pending(key) or self.digests.contains(*key):
+                self._track(hold, key)
+            else:
+                deals.append((deal, hold))
+        unseen = set(await self.db.filter_unseen(user_id, [deal.account.item_id for deal, _ in deals]))
+        deals = [(deal, hold) for deal, hold in deals if deal.account.item_id in unseen]
+        if settings.digest_enabled:
+            selected = deals[:self.digests.max_items]
+            self.digests.add(settings, [deal for deal, _ in selected])
+        else:
+            selected = deals[:5]
+            for deal, _ in selected:
+                await self.send_notification(user_id, deal, settings)
+        for deal, hold in selected:
+            self._track(hold, (user_id, deal.account.item_id))
+        for _, hold in deals[len(selected):]:
+            if hold:
+                hold.fail()
+    
+    def _track(self, hold: Optional[MarkHold], key: Tuple[int, int]):
+        if hold:
+            self.ledger.track(hold, key)
+    
+    async def send_notification(self, user_id: int, deal: DealAlert, settings: UserSettings,
+                                priority: Optional[int] = None, record: bool = True) -> bool:
+        msg, kb = self._render(deal, settings)
+        priority = -round(deal.score) if priority is None else priority
+        if not record:
+            return self.delivery.enqueue(user_id, msg, kb, priority)
+        
+        async def on_sent():
+            await self.db.mark_item_seen(user_id, deal.account.item_id)
+            await self.db.save_notification(
+                user_id, deal.account.item_id, deal.account.price, deal.score, deal.category, msg
             )
-            await self.db.save_notification(user_id, deal.account.item_id, msg)
-        except Exception as e:
-            print(f"Ошибка отправки уведомления {user_id}: {e}")
+        
+        return self.delivery.enqueue(
+            user_id, msg, kb, priority, keys=[(user_id, deal.account.item_id)], on_sent=on_sent
+        )
+    
+    async def _send_digests(self, force: bool = False):
+        for settings, deals in self.digests.pop_due(force=force):
+            if len(deals) == 1:
+                await self.send_notification(settings.user_id, deals[0], settings)
+            else:
+                await self.send_digest(settings.user_id, deals, settings)
+    
+    async def send_digest(self, user_id: int, deals: List[DealAlert], settings: UserSettings) -> bool:
+        msg, kb = self._format_digest(deals, settings)
+        
+        async def on_sent():
+            for n, deal in enumerate(deals):
+                await self.db.mark_item_seen(user_id, deal.account.item_id)
+                await self.db.save_notification(
+                    user_id, deal.account.item_id, deal.account.price, deal.score, deal.category,
+                    msg if n == 0 else None
+                )
+        
+        return self.delivery.enqueue(
+            user_id, msg, kb, -round(deals[0].score),
+            keys=[(user_id, deal.account.item_id) for deal in deals], on_sent=on_sent
+        )
+    
+    def _format_digest(self, deals: List[DealAlert], settings: UserSettings) -> Tuple[str, InlineKeyboardMarkup]:
+        msg = f"📦 <b>Дайджест выгодных предложений: {len(deals)}</b>\n"
+        buttons = []
+        for n, deal in enumerate(deals, 1):
+            acc = deal.account
+            details = [self._get_cat_name(acc, settings)]
+            if acc.game_version:
+                details.append(GAME_VERSION_NAMES.get(acc.game_version, acc.game_version))
+            if acc.level > 0:
+                details.append(f"ур. {acc.level}")
+            msg += f"\n<b>{n}.</b> {acc.price:,} ₽ — {', '.join(details)} (оценка {deal.score:.0f})"
+            buttons.append(InlineKeyboardButton(text=f"{n}. {acc.price:,} ₽", url=acc.url))
+        
+        rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+        return msg, InlineKeyboardMarkup(inline_keyboard=rows)
+    
+    def _render(self, deal: DealAlert, settings: UserSettings) -> Tuple[str, InlineKeyboardMarkup]:
+        key = (deal.account.item_id, deal.account.price, round(deal.score, 1), deal.category)
+        rendered = self.render_cache.get(key)
+        if rendered is None:
+            rendered = self._format_msg(deal, settings)
+            self.render_cache.set(key, rendered)
+        return rendered
     
     def _format_msg(self, deal: DealAlert, settings: UserSettings) -> Tuple[str, InlineKeyboardMarkup]:
         acc = deal.account
@@ -82,7 +362,7 @@ class MonitoringService:
         version = GAME_VERSION_NAMES.get(acc.game_version, acc.game_version)
         region = REGION_NAMES.get(acc.region, acc.region)
         origin = ORIGIN_NAMES.get(acc.origin, acc.origin)
-        cat_name = self._get_cat_name(acc, settings)
+        cat_name = CATEGORIES[deal.category]["name"] if deal.category in CATEGORIES else self._get_cat_name(acc, settings)
         
         msg = f"🎯 <b>Выгодное предложение!</b>\n\n<b>{cat_name}</b>\n<b>Цена:</b> {acc.price:,} ₽"
         
@@ -138,9 +418,15 @@ class MonitoringService:
         return "Неизвестная категория"
     
     async def cleanup(self):
+        if self.shard and not self.shard.owns('cleanup'):
+            return
         try:
             await self.db.cleanup_old_seen_items(7)
-            print("Очистка завершена")
+            await self.db.cleanup_old_watermarks(7)
+            deleted = await self.db.cleanup_old_notifications(
+                self.notification_retention_days, self.cleanup_batch_size
+            )
+            print(f"Очистка завершена, удалено уведомлений: {deleted}")
         except Exception as e:
             print(f"Ошибка очистки: {e}")
     
@@ -154,7 +440,9 @@ class MonitoringService:
             if accounts:
                 deals = self.analyzer.analyze_deals(accounts[:10], settings)
                 if deals:
-                    await self.send_notification(user_id, deals[0], settings)
+                    await self.send_notification(
+                        user_id, deals[0], settings, DeliveryQueue.PRIORITY_HIGH, record=False
+                    )
                     return True
             
             await self.bot.send_message(user_id, "Тест отправлен!\nНет подходящих предложений.")
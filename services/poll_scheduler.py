@@ -0,0 +1,76 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class CategoryPoll:
+    __slots__ = ("interval", "rate", "last_poll", "last_cost")
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.rate: Optional[float] = None
+        self.last_poll = 0.0
+        self.last_cost = 1
+
+
+class AdaptivePoller:
+    def __init__(self, base_interval: float, min_interval: float = 60, max_interval: float = 1800,
+                 requests_per_minute: float = 60, target_new: int = 10, smoothing: float = 0.3):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.requests_per_minute = requests_per_minute
+        self.target_new = target_new
+        self.smoothing = smoothing
+        self.categories: Dict[str, CategoryPoll] = {}
+        self.stats = {"polled": 0, "deferred": 0, "over_budget": 0}
+
+    def _state(self, category: str) -> CategoryPoll:
+        state = self.categories.get(category)
+        if state is None:
+            state = self.categories[category] = CategoryPoll(self.base_interval)
+        return state
+
+    def select(self, categories: Iterable[str], tick_seconds: float, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        overdue = []
+        for category in categories:
+            state = self._state(category)
+            ratio = (now - state.last_poll) / state.interval if state.last_poll else float("inf")
+            if ratio >= 1:
+                overdue.append((ratio, category))
+            else:
+                self.stats["deferred"] += 1
+
+        budget = self.requests_per_minute * tick_seconds / 60
+        selected, spent = [], 0
+        for _, category in sorted(overdue, reverse=True):
+            cost = self.categories[category].last_cost
+            if selected and spent + cost > budget:
+                self.stats["over_budget"] += 1
+                continue
+            selected.append(category)
+            spent += cost
+        return selected
+
+    def record(self, category: str, published_dates: Iterable[int], cost: int, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        state = self._state(category)
+        dates = sorted(set(published_dates))
+        elapsed = now - state.last_poll if state.last_poll else self.base_interval
+
+        span = dates[-1] - dates[0] if len(dates) >= 2 else 0
+        observed = (len(dates) - 1) / span if span > 0 else len(dates) / max(elapsed, 1.0)
+        if state.rate is None:
+            state.rate = observed
+        else:
+            state.rate += self.smoothing * (observed - state.rate)
+
+        interval = self.target_new / state.rate if state.rate > 0 else state.interval * 2
+        state.interval = min(self.max_interval, max(self.min_interval, interval))
+        state.last_poll = now
+        state.last_cost = max(1, cost)
+        self.stats["polled"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        intervals = {category: round(state.interval) for category, state in self.categories.items()}
+        return {**self.stats, "intervals": intervals}
@@ -0,0 +1,154 @@
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.models import TarkovAccount
+
+
+BucketKey = Tuple[str, str, int, str]
+
+
+class P2Quantile:
+    __slots__ = ("p", "n", "heights", "positions", "desired")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.n = 0
+        self.heights: List[float] = []
+        self.positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+
+    def add(self, x: float):
+        self.n += 1
+        q = self.heights
+        if self.n <= 5:
+            q.append(x)
+            if self.n == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(1, 5) if x < q[i]) - 1
+
+        pos = self.positions
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        p = self.p
+        for i, step in enumerate((0, p / 2, p, (1 + p) / 2, 1)):
+            self.desired[i] += step
+
+        for i in range(1, 4):
+            d = self.desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = height
+                pos[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, pos = self.heights, self.positions
+        return q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+            (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+            + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if self.n >= 5:
+            return self.heights[2]
+        ordered = sorted(self.heights)
+        return ordered[round(self.p * (len(ordered) - 1))]
+
+    def dump(self) -> list:
+        return [self.n, self.heights, self.positions, self.desired]
+
+    @classmethod
+    def load(cls, p: float, state: list) -> "P2Quantile":
+        estimator = cls(p)
+        estimator.n, estimator.heights, estimator.positions, estimator.desired = state
+        return estimator
+
+
+class PriceStats:
+    __slots__ = ("p25", "p50")
+
+    def __init__(self):
+        self.p25 = P2Quantile(0.25)
+        self.p50 = P2Quantile(0.5)
+
+    @property
+    def count(self) -> int:
+        return self.p50.n
+
+    def add(self, price: float):
+        self.p25.add(price)
+        self.p50.add(price)
+
+
+class PriceIndex:
+    def __init__(self, min_samples: int = 20, max_seen: int = 100000):
+        self.min_samples = min_samples
+        self.max_seen = max_seen
+        self.buckets: Dict[BucketKey, PriceStats] = {}
+        self.dirty: set = set()
+        self.seen: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def bucket(category: str, game_version: str = '', level: int = 0, region: str = '') -> BucketKey:
+        if category != "escape_from_tarkov":
+            return category, '', 0, ''
+        return category, game_version, min(max(level, 0) // 10, 5), region
+
+    def observe(self, category: str, accounts: Iterable[TarkovAccount]):
+        for acc in accounts:
+            if acc.price <= 0 or acc.item_id in self.seen:
+                continue
+            self.seen[acc.item_id] = None
+            if len(self.seen) > self.max_seen:
+                self.seen.popitem(last=False)
+            key = self.bucket(category, acc.game_version, acc.level, acc.region)
+            stats = self.buckets.get(key)
+            if stats is None:
+                stats = self.buckets[key] = PriceStats()
+            stats.add(acc.price)
+            self.dirty.add(key)
+
+    def median(self, key: BucketKey) -> Optional[float]:
+        stats = self.buckets.get(key)
+        if stats is None or stats.count < self.min_samples:
+            return None
+        return stats.p50.value()
+
+    def quantiles(self, key: BucketKey) -> Optional[Tuple[float, float]]:
+        stats = self.buckets.get(key)
+        if stats is None or stats.count < self.min_samples:
+            return None
+        return stats.p25.value(), stats.p50.value()
+
+    def dump_dirty(self) -> Dict[str, str]:
+        rows = {}
+        for key in self.dirty:
+            stats = self.buckets[key]
+            rows["|".join(map(str, key))] = json.dumps(
+                {"p25": stats.p25.dump(), "p50": stats.p50.dump()}, separators=(',', ':')
+            )
+        self.dirty.clear()
+        return rows
+
+    def load(self, rows: Dict[str, str]):
+        for name, state in rows.items():
+            category, version, level, region = name.split("|")
+            data = json.loads(state)
+            stats = PriceStats()
+            stats.p25 = P2Quantile.load(0.25, data["p25"])
+            stats.p50 = P2Quantile.load(0.5, data["p50"])
+            self.buckets[(category, version, int(level), region)] = stats
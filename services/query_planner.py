@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.models import UserSettings, CATEGORIES
+
+
+GroupKey = Tuple[str, str, Optional[bool], Optional[bool]]
+
+
+def group_key(cat: str, settings: UserSettings) -> GroupKey:
+    return cat, settings.show, settings.sb, settings.email_login_data
+
+
+@dataclass
+class PlannedQuery:
+    category: str
+    settings: UserSettings
+    subscribers: Dict[int, UserSettings] = field(default_factory=dict)
+
+
+class QueryPlanner:
+    def plan(self, users: List[UserSettings], categories: Optional[Iterable[str]] = None) -> List[PlannedQuery]:
+        allowed = set(categories) if categories is not None else None
+        groups: Dict[GroupKey, List[UserSettings]] = {}
+        for settings in users:
+            for cat in settings.categories:
+                if cat not in CATEGORIES or (allowed is not None and cat not in allowed):
+                    continue
+                groups.setdefault(group_key(cat, settings), []).append(settings)
+
+        queries = []
+        for (cat, show, sb, email_login_data), members in groups.items():
+            query = PlannedQuery(cat, self._superset(cat, members, show, sb, email_login_data))
+            for settings in members:
+                query.subscribers[settings.user_id] = settings
+            queries.append(query)
+        return queries
+
+    def _superset(self, cat: str, members: List[UserSettings], show: str,
+                  sb: Optional[bool], email_login_data: Optional[bool]) -> UserSettings:
+        regions = self._union(s.regions for s in members)
+        return UserSettings(
+            user_id=0,
+            categories=[cat],
+            min_price=self._lower(s.min_price for s in members),
+            max_price=self._upper(s.max_price for s in members),
+            game_versions=self._union(s.game_versions for s in members),
+            regions=regions if len(regions) == 1 else [],
+            origins=self._union(s.origins for s in members),
+            min_level=self._lower(s.min_level for s in members),
+            max_level=self._upper(s.max_level for s in members),
+            order_by="pdate_to_down",
+            show=show,
+            nsb=self._common(s.nsb for s in members),
+            sb=sb,
+            email_login_data=email_login_data,
+            pve_access=self._common(s.pve_access for s in members)
+        )
+
+    @staticmethod
+    def _lower(values: Iterable[Optional[int]]) -> Optional[int]:
+        values = list(values)
+        if not all(values):
+            return None
+        return min(values)
+
+    @staticmethod
+    def _upper(values: Iterable[Optional[int]]) -> Optional[int]:
+        values = list(values)
+        if not all(values):
+            return None
+        return max(values)
+
+    @staticmethod
+    def _union(values: Iterable[Optional[List[str]]]) -> List[str]:
+        result = set()
+        for value in values:
+            if not value:
+                return []
+            result.update(value)
+        return sorted(result)
+
+    @staticmethod
+    def _common(values: Iterable):
+        values = set(values)
+        return values.pop() if len(values) == 1 else None
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_time": 0.0}
+
+    async def acquire(self):
+        async with self._lock:
+            waited = 0.0
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+            self.stats["acquired"] += 1
+            if waited:
+                self.stats["waited"] += 1
+                self.stats["wait_time"] += waited
+
+    def try_acquire(self) -> float:
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.stats["acquired"] += 1
+        return 0.0
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated = self.blocked_until
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_stats(self) -> Dict[str, Any]:
+        acquired = self.stats["acquired"]
+        avg_wait = self.stats["wait_time"] / acquired if acquired else 0.0
+        return {**self.stats, "avg_wait": avg_wait}
@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import os
+from bisect import bisect_right
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from utils.database import Database
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 64):
+        self.replicas = max(1, replicas)
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(self.replicas))
+        self.points = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def owner(self, key: Hashable) -> Optional[str]:
+        if not self.points:
+            return None
+        i = bisect_right(self.points, _hash(str(key)))
+        return self.owners[i % len(self.owners)]
+
+
+class ShardCoordinator:
+    def __init__(self, db: Database, worker_id: str, heartbeat_seconds: float = 10,
+                 lease_seconds: float = 30, replicas: int = 64):
+        self.db = db
+        self.worker_id = worker_id
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease_seconds = max(lease_seconds, heartbeat_seconds * 2)
+        self.replicas = replicas
+        self.ring = HashRing([worker_id], replicas)
+        self.version = 0
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"heartbeats": 0, "rebalances": 0, "errors": 0}
+
+    async def start(self):
+        await self.heartbeat()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.db.release_worker(self.worker_id)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Ошибка heartbeat {self.worker_id}: {e}")
+
+    async def heartbeat(self) -> bool:
+        await self.db.heartbeat_worker(self.worker_id, os.getpid())
+        workers = await self.db.get_live_workers(self.lease_seconds)
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+        self.stats["heartbeats"] += 1
+        if sorted(workers) == self.ring.nodes:
+            return False
+
+        self.ring = HashRing(workers, self.replicas)
+        self.version += 1
+        self.stats["rebalances"] += 1
+        print(f"Шард {self.worker_id}: активных воркеров {len(self.ring.nodes)}")
+        return True
+
+    def owns(self, key: Hashable) -> bool:
+        return self.ring.owner(key) == self.worker_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "worker_id": self.worker_id, "workers": list(self.ring.nodes)}
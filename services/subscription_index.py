@@ -0,0 +1,216 @@
+import copy
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from services.query_planner import GroupKey, group_key
+from utils.account_batch import AccountBatch
+from utils.models import UserSettings, CATEGORIES
+
+
+EMPTY: frozenset = frozenset()
+
+
+class IntervalNode:
+    __slots__ = ("center", "starts", "start_ids", "ends", "end_ids", "left", "right")
+
+    def __init__(self, center: float, intervals: List[Tuple[int, Tuple[float, float]]]):
+        self.center = center
+        by_start = sorted((low, user_id) for user_id, (low, _) in intervals)
+        by_end = sorted((high, user_id) for user_id, (_, high) in intervals)
+        self.starts = [low for low, _ in by_start]
+        self.start_ids = [user_id for _, user_id in by_start]
+        self.ends = [high for high, _ in by_end]
+        self.end_ids = [user_id for _, user_id in by_end]
+        self.left: Optional["IntervalNode"] = None
+        self.right: Optional["IntervalNode"] = None
+
+
+class IntervalTree:
+    def __init__(self):
+        self.intervals: Dict[int, Tuple[float, float]] = {}
+        self.root: Optional[IntervalNode] = None
+        self.dirty = False
+
+    def add(self, user_id: int, low: Optional[int], high: Optional[int]):
+        bounds = (low or -math.inf, high or math.inf)
+        if bounds[0] <= bounds[1]:
+            self.intervals[user_id] = bounds
+            self.dirty = True
+
+    def remove(self, user_id: int):
+        if self.intervals.pop(user_id, None) is not None:
+            self.dirty = True
+
+    def stab(self, x: float) -> List[int]:
+        if self.dirty:
+            self.root = self._build(list(self.intervals.items()))
+            self.dirty = False
+
+        found: List[int] = []
+        node = self.root
+        while node is not None:
+            if x < node.center:
+                found += node.start_ids[:bisect_right(node.starts, x)]
+                node = node.left
+            elif x > node.center:
+                found += node.end_ids[bisect_left(node.ends, x):]
+                node = node.right
+            else:
+                found += node.start_ids
+                break
+        return found
+
+    def _build(self, items: List[Tuple[int, Tuple[float, float]]]) -> Optional[IntervalNode]:
+        if not items:
+            return None
+
+        points = sorted(p for _, bounds in items for p in bounds if math.isfinite(p))
+        center = points[len(points) // 2] if points else 0
+        left, right, here = [], [], []
+        for item in items:
+            low, high = item[1]
+            if high < center:
+                left.append(item)
+            elif low > center:
+                right.append(item)
+            else:
+                here.append(item)
+
+        node = IntervalNode(center, here)
+        node.left = self._build(left)
+        node.right = self._build(right)
+        return node
+
+
+class ValueIndex:
+    def __init__(self):
+        self.by_value: Dict[Hashable, Set[int]] = {}
+        self.any: Set[int] = set()
+
+    def add(self, user_id: int, values: Optional[Iterable[Hashable]]):
+        values = list(values or [])
+        if not values:
+            self.any.add(user_id)
+        for value in values:
+            self.by_value.setdefault(value, set()).add(user_id)
+
+    def remove(self, user_id: int):
+        self.any.discard(user_id)
+        for value in [value for value, users in self.by_value.items() if user_id in users]:
+            users = self.by_value[value]
+            users.discard(user_id)
+            if not users:
+                del self.by_value[value]
+
+
+class GroupIndex:
+    def __init__(self, category: str):
+        self.tarkov = category == "escape_from_tarkov"
+        self.users: Set[int] = set()
+        self.price = IntervalTree()
+        self.level = IntervalTree()
+        self.nsb = ValueIndex()
+        self.pve = ValueIndex()
+        self.versions = ValueIndex()
+        self.regions = ValueIndex()
+        self.origins = ValueIndex()
+
+    def add(self, settings: UserSettings):
+        user_id = settings.user_id
+        pve = (settings.pve_access == "yes") if settings.pve_access in ("yes", "no") else None
+        self.users.add(user_id)
+        self.price.add(user_id, settings.min_price, settings.max_price)
+        self.nsb.add(user_id, None if settings.nsb is None else [settings.nsb])
+        self.origins.add(user_id, settings.origins)
+        if self.tarkov:
+            self.level.add(user_id, settings.min_level, settings.max_level)
+            self.pve.add(user_id, None if pve is None else [pve])
+            self.versions.add(user_id, settings.game_versions)
+            self.regions.add(user_id, settings.regions)
+
+    def remove(self, user_id: int):
+        self.users.discard(user_id)
+        for tree in (self.price, self.level):
+            tree.remove(user_id)
+        for values in (self.nsb, self.pve, self.versions, self.regions, self.origins):
+            values.remove(user_id)
+
+    def match(self, batch: AccountBatch, i: int) -> Set[int]:
+        found = set(self.price.stab(batch.price[i]))
+        dimensions = [(self.nsb, bool(batch.nsb[i])), (self.origins, batch.origin[i])]
+        if self.tarkov:
+            found.intersection_update(self.level.stab(batch.level[i]))
+            dimensions += [
+                (self.pve, bool(batch.pve_access[i])),
+                (self.versions, batch.game_version[i]),
+                (self.regions, batch.region[i])
+            ]
+
+        for index, value in dimensions:
+            if not found:
+                break
+            if index.by_value:
+                found = (found & index.any) | (found & index.by_value.get(value, EMPTY))
+        return found
+
+
+class SubscriptionIndex:
+    def __init__(self):
+        self.groups: Dict[GroupKey, GroupIndex] = {}
+        self.memberships: Dict[int, List[GroupKey]] = {}
+        self.snapshots: Dict[int, UserSettings] = {}
+
+    def rebuild(self, users: Iterable[UserSettings]):
+        self.groups.clear()
+        self.memberships.clear()
+        self.snapshots.clear()
+        for settings in users:
+            self.update(settings)
+
+    def sync(self, users: Iterable[UserSettings]) -> int:
+        changed = 0
+        for settings in users:
+            if self.snapshots.get(settings.user_id) != settings:
+                self.update(settings)
+                changed += 1
+        return changed
+
+    def update(self, settings: UserSettings):
+        self.remove(settings.user_id)
+        self.snapshots[settings.user_id] = copy.deepcopy(settings)
+        if not settings.notifications_enabled:
+            return
+
+        keys = []
+        for cat in dict.fromkeys(settings.categories):
+            if cat not in CATEGORIES:
+                continue
+            key = group_key(cat, settings)
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = GroupIndex(cat)
+            group.add(settings)
+            keys.append(key)
+        self.memberships[settings.user_id] = keys
+
+    def remove(self, user_id: int):
+        self.snapshots.pop(user_id, None)
+        for key in self.memberships.pop(user_id, []):
+            group = self.groups[key]
+            group.remove(user_id)
+            if not group.users:
+                del self.groups[key]
+
+    def route(self, key: GroupKey, batch: AccountBatch) -> Dict[int, List[int]]:
+        group = self.groups.get(key)
+        routed: Dict[int, List[int]] = {}
+        if group is None:
+            return routed
+        for i in range(len(batch)):
+            for user_id in group.match(batch, i):
+                routed.setdefault(user_id, []).append(i)
+        return routed
+
+    def __len__(self) -> int:
+        return len(self.memberships)
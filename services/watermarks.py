@@ -0,0 +1,80 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+Mark = Tuple[int, int]
+
+
+class MarkHold:
+    __slots__ = ("key", "mark", "outstanding", "open", "failed")
+
+    def __init__(self, key: str, mark: Mark):
+        self.key = key
+        self.mark = mark
+        self.outstanding: Set[Hashable] = set()
+        self.open = True
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+    @property
+    def settled(self) -> bool:
+        return not self.open and not self.outstanding
+
+
+class WatermarkLedger:
+    def __init__(self, committed: Optional[Dict[str, Mark]] = None):
+        self.committed: Dict[str, Mark] = dict(committed or {})
+        self.holds: List[MarkHold] = []
+        self.inflight: Dict[Hashable, List[MarkHold]] = {}
+        self.stats = {"committed": 0, "failed": 0}
+
+    def get(self, key: str) -> Optional[Mark]:
+        return self.committed.get(key)
+
+    def hold(self, key: str, mark: Mark) -> MarkHold:
+        hold = MarkHold(key, mark)
+        self.holds.append(hold)
+        return hold
+
+    def track(self, hold: MarkHold, key: Hashable):
+        if key not in hold.outstanding:
+            hold.outstanding.add(key)
+            self.inflight.setdefault(key, []).append(hold)
+
+    def settle(self, keys: Iterable[Hashable], done: bool):
+        for key in keys:
+            for hold in self.inflight.pop(key, ()):
+                hold.outstanding.discard(key)
+                if not done:
+                    hold.fail()
+
+    def close(self, holds: Iterable[MarkHold]):
+        for hold in holds:
+            hold.open = False
+
+    def ready(self) -> Dict[str, Mark]:
+        marks: Dict[str, Mark] = {}
+        pending = []
+        for hold in self.holds:
+            if hold.failed:
+                self.stats["failed"] += 1
+                self._untrack(hold)
+            elif not hold.settled:
+                pending.append(hold)
+            elif hold.mark > self.committed.get(hold.key, (0, 0)):
+                self.committed[hold.key] = marks[hold.key] = hold.mark
+                self.stats["committed"] += 1
+        self.holds = pending
+        return marks
+
+    def _untrack(self, hold: MarkHold):
+        for key in hold.outstanding:
+            holds = self.inflight.get(key, [])
+            if hold in holds:
+                holds.remove(hold)
+            if not holds:
+                self.inflight.pop(key, None)
+        hold.outstanding.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "held": len(self.holds), "inflight": len(self.inflight)}
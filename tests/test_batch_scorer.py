@@ -0,0 +1,94 @@
+import random
+import time
+
+import pytest
+
+from services.batch_scorer import np
+from services.deal_analyzer import DealAnalyzer
+from services.listing_parser import parse_accounts
+from utils.account_batch import AccountBatch
+from utils.models import UserSettings
+
+pytestmark = pytest.mark.skipif(np is None, reason="numpy is not installed")
+
+NOW = int(time.time())
+
+
+def make_items(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{
+        "item_id": 100000 + i,
+        "title": f"account #{i}",
+        "price": rng.randint(20, 10000),
+        "priceWithSellerFee": rng.randint(20, 10000) * 1.05,
+        "tarkov_game_version": rng.choice(["standard", "left_behind", "edge_of_darkness", "unheard_edition"]),
+        "tarkov_level": rng.randint(0, 70),
+        "tarkov_region": rng.choice(["eu", "cis", "us"]),
+        "item_origin": rng.choice(["brute", "personal", "resale"]),
+        "seller": {"username": f"seller{i % 50}", "sold_items_count": rng.randint(0, 3000),
+                   "restore_percents": rng.choice([None, rng.randint(0, 20)])},
+        "tarkov_rubles": rng.randint(0, 5000000),
+        "tarkov_dollars": rng.randint(0, 5000),
+        "tarkov_euros": rng.randint(0, 5000),
+        "nsb": rng.randint(0, 1),
+        "allow_ask_discount": rng.randint(0, 1),
+        "max_discount_percent": rng.randint(0, 30),
+        "published_date": NOW - rng.randint(0, 86400),
+        "tarkov_last_activity": NOW - rng.randint(0, 864000),
+        "email_type": "market",
+        "email_provider": "other",
+        "tarkov_access_pve": rng.randint(0, 1)
+    } for i in range(count)]
+
+
+def assert_parity(analyzer: DealAnalyzer, batch: AccountBatch, settings: UserSettings):
+    category = batch.category or analyzer._default_category(settings)
+    intrinsic, tarkov = analyzer.batch_scorer.intrinsic(batch, category)
+    scores = analyzer.batch_scorer.user_scores(batch, settings, intrinsic, tarkov, NOW, list(range(len(batch))))
+    for i, account in enumerate(batch):
+        scalar = min(analyzer._calc_score(account, settings, NOW, category)[0], 100)
+        assert scores[i] == scalar, f"item {account.item_id}"
+
+
+@pytest.mark.parametrize("cat", ["escape_from_tarkov", "steam"])
+@pytest.mark.parametrize("categories", [["escape_from_tarkov"], ["steam"], ["gifts"], ["telegram", "steam"]])
+def test_batch_scores_match_scalar(cat, categories):
+    analyzer = DealAnalyzer()
+    batch = AccountBatch(parse_accounts(make_items(2000), cat))
+    assert_parity(analyzer, batch, UserSettings(0, categories, max_discount_threshold=10))
+
+
+@pytest.mark.parametrize("cat", ["escape_from_tarkov", "steam"])
+def test_analyze_batch_matches_analyze_deals(cat, monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: NOW)
+    analyzer = DealAnalyzer()
+    accounts = parse_accounts(make_items(2000, seed=1), cat)
+    settings = UserSettings(0, [cat])
+    expected = analyzer.analyze_deals(accounts, settings)
+    actual = analyzer.analyze_batch(AccountBatch(accounts, cat), settings)
+    assert [(d.account.item_id, d.score) for d in actual] == [(d.account.item_id, d.score) for d in expected]
+
+
+def test_cached_reasons_follow_price_index(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: NOW)
+    analyzer = DealAnalyzer(min_samples=5)
+    accounts = parse_accounts(make_items(2000, seed=2), "steam")
+    settings = UserSettings(0, ["steam"])
+    analyzer.analyze_deals(accounts, settings)
+    analyzer.price_index.observe("steam", accounts)
+
+    batch = AccountBatch(accounts, "steam")
+    assert_parity(analyzer, batch, settings)
+    expected = analyzer.analyze_deals(accounts, settings)
+    actual = analyzer.analyze_batch(batch, settings)
+    assert [(d.account.item_id, d.score, d.reason) for d in actual] == \
+        [(d.account.item_id, d.score, d.reason) for d in expected]
+
+
+def test_price_index_counts_each_listing_once():
+    analyzer = DealAnalyzer(min_samples=5)
+    accounts = parse_accounts(make_items(200, seed=3), "steam")
+    analyzer.price_index.observe("steam", accounts)
+    analyzer.price_index.observe("steam", accounts)
+    stats = analyzer.price_index.buckets[analyzer.price_index.bucket("steam")]
+    assert stats.count == sum(1 for acc in accounts if acc.price > 0)
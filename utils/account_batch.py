@@ -0,0 +1,115 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List
+
+from utils.models import TarkovAccount
+
+
+def _int(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class StringColumn:
+    def __init__(self):
+        self.codes = array('H')
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def append(self, value: str):
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(sys.intern(value))
+            self.index[value] = code
+        self.codes.append(code)
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class AccountBatch:
+    INT_COLUMNS = {
+        'item_id': 'q', 'price': 'q', 'level': 'l', 'seller_sold_items': 'l',
+        'rubles': 'q', 'dollars': 'q', 'euros': 'q', 'max_discount_percent': 'l',
+        'published_date': 'q', 'last_activity': 'q'
+    }
+    FLAG_COLUMNS = ('nsb', 'allow_ask_discount', 'pve_access')
+    STRING_COLUMNS = ('game_version', 'region', 'origin', 'email_type', 'email_provider')
+
+    def __init__(self, accounts: Iterable[TarkovAccount] = (), category: str = ''):
+        self.category = category
+        for name, typecode in self.INT_COLUMNS.items():
+            setattr(self, name, array(typecode))
+        for name in self.FLAG_COLUMNS:
+            setattr(self, name, array('b'))
+        for name in self.STRING_COLUMNS:
+            setattr(self, name, StringColumn())
+        self.price_with_seller_fee = array('d')
+        self.seller_restore_percent = array('l')
+        self.title: List[str] = []
+        self.seller_username: List[str] = []
+
+        for acc in accounts:
+            self.append(acc)
+
+    def append(self, acc: TarkovAccount):
+        for name in self.INT_COLUMNS:
+            getattr(self, name).append(_int(getattr(acc, name)))
+        for name in self.FLAG_COLUMNS:
+            getattr(self, name).append(bool(getattr(acc, name)))
+        for name in self.STRING_COLUMNS:
+            getattr(self, name).append(getattr(acc, name) or '')
+        self.price_with_seller_fee.append(_float(acc.price_with_seller_fee))
+        self.seller_restore_percent.append(-1 if acc.seller_restore_percent is None else _int(acc.seller_restore_percent))
+        self.title.append(acc.title)
+        self.seller_username.append(sys.intern(acc.seller_username))
+
+    def __len__(self) -> int:
+        return len(self.item_id)
+
+    def __iter__(self) -> Iterator[TarkovAccount]:
+        for i in range(len(self)):
+            yield self.account(i)
+
+    def account(self, i: int) -> TarkovAccount:
+        restore = self.seller_restore_percent[i]
+        return TarkovAccount(
+            item_id=self.item_id[i],
+            title=self.title[i],
+            price=self.price[i],
+            price_with_seller_fee=self.price_with_seller_fee[i],
+            game_version=self.game_version[i],
+            level=self.level[i],
+            region=self.region[i],
+            origin=self.origin[i],
+            seller_username=self.seller_username[i],
+            seller_sold_items=self.seller_sold_items[i],
+            seller_restore_percent=None if restore < 0 else restore,
+            rubles=self.rubles[i],
+            dollars=self.dollars[i],
+            euros=self.euros[i],
+            nsb=bool(self.nsb[i]),
+            allow_ask_discount=bool(self.allow_ask_discount[i]),
+            max_discount_percent=self.max_discount_percent[i],
+            published_date=self.published_date[i],
+            last_activity=self.last_activity[i],
+            email_type=self.email_type[i],
+            email_provider=self.email_provider[i],
+            pve_access=bool(self.pve_access[i]),
+            url=f"https://lzt.market/{self.item_id[i]}/"
+        )
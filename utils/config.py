@@ -5,6 +5,51 @@ from typing import Dict, Any
 
 class ConfigManager:
     CONFIG_FILE = "bot_config.json"
+    DEFAULTS = {
+        'http_connection_limit': 10,
+        'http_dns_cache_ttl': 300,
+        'http_keepalive_timeout': 30,
+        'http_request_timeout': 15,
+        'http_connect_timeout': 5,
+        'api_requests_per_minute': 120,
+        'api_burst': 3,
+        'api_max_retries': 3,
+        'api_backoff_base': 1.0,
+        'api_backoff_max': 30,
+        'api_max_pages': 5,
+        'api_max_concurrency': 4,
+        'json_decoder': 'auto',
+        'score_cache_size': 50000,
+        'score_cache_ttl': 3600,
+        'price_index_min_samples': 20,
+        'db_flush_rows': 200,
+        'db_flush_interval_ms': 1000,
+        'seen_filter_fp_rate': 0.01,
+        'seen_filter_capacity': 1000,
+        'settings_cache_size': 10000,
+        'notification_store_text': False,
+        'notification_retention_days': 30,
+        'cleanup_batch_size': 500,
+        'monitor_user_concurrency': 8,
+        'monitor_user_timeout': 60,
+        'telegram_messages_per_second': 25,
+        'telegram_per_chat_per_second': 1,
+        'delivery_workers': 8,
+        'delivery_max_retries': 3,
+        'digest_max_items': 10,
+        'digest_window_seconds': 0,
+        'render_cache_size': 5000,
+        'render_cache_ttl': 600,
+        'adaptive_polling': False,
+        'poll_min_interval_seconds': 60,
+        'poll_max_interval_seconds': 1800,
+        'poll_requests_per_minute': 60,
+        'poll_target_new': 10,
+        'shard_workers': 0,
+        'shard_heartbeat_seconds': 10,
+        'shard_lease_seconds': 30,
+        'shard_ring_replicas': 64
+    }
     
     @classmethod
     def load_config(cls) -> Dict[str, Any]:
@@ -57,4 +102,4 @@ class ConfigManager:
             print("Конфигурация не найдена или неполная.")
             config = cls.setup_config()
         
-        return config
+        return {**cls.DEFAULTS, **config}
@@ -1,123 +1,745 @@
 import aiosqlite
+import asyncio
 import json
-from typing import List, Optional
-from utils.models import UserSettings
+import re
+import time
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from utils.models import UserSettings, CATEGORIES
+from utils.seen_filter import SeenFilter
+from utils.cache import TTLCache
 
 
 class Database:
-    def __init__(self, db_path: str):
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000
+    }
+    MAX_VARIABLES = 500
+    FILTER_TABLES = {
+        'user_categories': 'category',
+        'user_versions': 'game_version',
+        'user_regions': 'region',
+        'user_origins': 'origin'
+    }
+    USER_COLUMNS = (
+        'min_price', 'max_price', 'min_level', 'max_level', 'order_by', 'show', 'nsb', 'sb',
+        'email_login_data', 'pve_access', 'notifications_enabled', 'max_discount_threshold',
+        'digest_enabled'
+    )
+    
+    def __init__(self, db_path: str, flush_rows: int = 200, flush_interval: float = 1.0,
+                 seen_fp_rate: float = 0.01, seen_capacity: int = 1000, settings_cache_size: int = 10000,
+                 store_notification_text: bool = False):
         self.db_path = db_path
+        self.conn: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending_seen: Dict[Tuple[int, int], None] = {}
+        self._pending_notifications: List[Tuple[int, int, int, int, str, int, Optional[bytes]]] = []
+        self.store_notification_text = store_notification_text
+        self._flush_task: Optional[asyncio.Task] = None
+        self.seen_filter = SeenFilter(seen_fp_rate, seen_capacity)
+        self.seen_users: Optional[Set[int]] = None
+        self.settings_cache = TTLCache(settings_cache_size)
+        self.settings_listeners: List[Callable[[UserSettings], None]] = []
+    
+    async def connect(self):
+        if self.conn is not None:
+            return
+        self.conn = await aiosqlite.connect(self.db_path, cached_statements=256)
+        for name, value in self.PRAGMAS.items():
+            await self.conn.execute(f"PRAGMA {name} = {value}")
+    
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self.conn is None:
+            return
+        await self.flush()
+        await self.conn.close()
+        self.conn = None
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Ошибка записи в БД: {e}")
+    
+    async def flush(self):
+        if not self._pending_seen and not self._pending_notifications:
+            return
+        
+        async with self._db() as db:
+            seen, self._pending_seen = self._pending_seen, {}
+            notifications, self._pending_notifications = self._pending_notifications, []
+            try:
+                await db.executemany('INSERT OR IGNORE INTO seen_items (user_id, item_id) VALUES (?, ?)', list(seen))
+                await db.executemany('''
+                    INSERT INTO notifications (user_id, item_id, price, score, category, sent_at, message)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', notifications)
+                await self._rollup_notifications(db, notifications)
+                await db.commit()
+            except BaseException:
+                self._pending_seen = {**seen, **self._pending_seen}
+                self._pending_notifications = notifications + self._pending_notifications
+                await db.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def _db(self) -> AsyncIterator[aiosqlite.Connection]:
+        if self.conn is None:
+            await self.connect()
+        async with self._lock:
+            yield self.conn
     
-    async def init_db(self):
-        async with aiosqlite.connect(self.db_path) as db:
+    async def init_db(self, load_seen_filter: bool = True):
+        await self.connect()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        async with self._db() as db:
+            await self._create_users_table(db, 'users')
+            for table, column in self.FILTER_TABLES.items():
+                extra = 'position INTEGER NOT NULL DEFAULT 0,' if table == 'user_categories' else ''
+                await db.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        user_id INTEGER NOT NULL,
+                        {column} TEXT NOT NULL,
+                        {extra}
+                        PRIMARY KEY (user_id, {column}),
+                        FOREIGN KEY (user_id) REFERENCES users (user_id)
+                    ) WITHOUT ROWID
+                ''')
+                await db.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column}, user_id)')
+            await self._migrate_users(db)
+            await self._add_user_columns(db)
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_users_active_price ON users (notifications_enabled, min_price, max_price)')
+            
+            await self._migrate_seen_items(db)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS seen_items (
+                    user_id INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (user_id, item_id),
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                ) WITHOUT ROWID
+            ''')
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_seen_items_seen_at ON seen_items (seen_at)')
+            
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS notification_daily (
+                    day TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    notifications INTEGER NOT NULL DEFAULT 0,
+                    price_sum INTEGER NOT NULL DEFAULT 0,
+                    score_sum INTEGER NOT NULL DEFAULT 0,
+                    min_price INTEGER NOT NULL DEFAULT 0,
+                    max_price INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, category)
+                ) WITHOUT ROWID
+            ''')
             await db.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    settings TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                CREATE TABLE IF NOT EXISTS notification_daily_users (
+                    day TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    notifications INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, category, user_id)
+                ) WITHOUT ROWID
+            ''')
+            await self._migrate_notifications(db)
+            await self._create_notifications_table(db, 'notifications')
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_notifications_sent_at ON notifications (sent_at)')
+            
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    query_key TEXT PRIMARY KEY,
+                    published_date INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
             await db.execute('''
-                CREATE TABLE IF NOT EXISTS seen_items (
-                    item_id INTEGER PRIMARY KEY,
-                    user_id INTEGER,
-                    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                CREATE TABLE IF NOT EXISTS price_index (
+                    bucket TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             
             await db.execute('''
-                CREATE TABLE IF NOT EXISTS notifications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    item_id INTEGER,
-                    message TEXT,
-                    sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker_id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    heartbeat_at REAL NOT NULL
                 )
             ''')
             await db.commit()
+        if load_seen_filter:
+            await self.rebuild_seen_filter()
+        else:
+            self.seen_users = set()
     
-    async def save_user_settings(self, user_id: int, settings: UserSettings):
-        data = {
-            'categories': settings.categories,
-            'min_price': settings.min_price,
-            'max_price': settings.max_price,
-            'game_versions': settings.game_versions or [],
-            'regions': settings.regions or [],
-            'origins': settings.origins or [],
-            'min_level': settings.min_level,
-            'max_level': settings.max_level,
-            'order_by': settings.order_by,
-            'show': settings.show,
-            'nsb': settings.nsb,
-            'sb': settings.sb,
-            'email_login_data': settings.email_login_data,
-            'pve_access': settings.pve_access,
-            'notifications_enabled': settings.notifications_enabled,
-            'max_discount_threshold': settings.max_discount_threshold
-        }
+    async def rebuild_seen_filter(self):
+        if self.seen_users is not None:
+            await self.refresh_seen_filter(list(self.seen_users))
+            return
+        async with self._db() as db:
+            cursor = await db.execute('SELECT user_id, item_id FROM seen_items')
+            rows = await cursor.fetchall()
+            self.seen_filter.rebuild([*rows, *self._pending_seen])
+        stats = self.seen_filter.get_stats()
+        print(f"Фильтр просмотренных: {stats['items']} записей, {stats['memory_bytes'] / 1024:.0f} КБ")
+    
+    async def refresh_seen_filter(self, user_ids: List[int]):
+        user_ids = list(user_ids)
+        rows = []
+        async with self._db() as db:
+            for start in range(0, len(user_ids), self.MAX_VARIABLES):
+                chunk = user_ids[start:start + self.MAX_VARIABLES]
+                cursor = await db.execute(
+                    f"SELECT user_id, item_id FROM seen_items WHERE user_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                rows.extend(await cursor.fetchall())
+        owned = set(user_ids)
+        self.seen_filter.reload(owned, [*rows, *(key for key in self._pending_seen if key[0] in owned)])
+        if self.seen_users is not None:
+            self.seen_users.update(owned)
+    
+    def release_seen_filter(self, user_ids: List[int]):
+        self.seen_filter.discard(user_ids)
+        if self.seen_users is not None:
+            self.seen_users.difference_update(user_ids)
+    
+    async def _migrate_seen_items(self, db: aiosqlite.Connection):
+        cursor = await db.execute('PRAGMA table_info(seen_items)')
+        primary_key = [row[1] for row in sorted(await cursor.fetchall(), key=lambda row: row[5]) if row[5]]
+        if primary_key != ['item_id']:
+            return
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT OR REPLACE INTO users (user_id, settings, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (user_id, json.dumps(data)))
-            await db.commit()
+        print("Миграция seen_items на составной ключ (user_id, item_id)...")
+        await db.execute('ALTER TABLE seen_items RENAME TO seen_items_old')
+        await db.execute('''
+            CREATE TABLE seen_items (
+                user_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, item_id),
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            ) WITHOUT ROWID
+        ''')
+        await db.execute('''
+            INSERT OR IGNORE INTO seen_items (user_id, item_id, seen_at)
+            SELECT user_id, item_id, seen_at FROM seen_items_old WHERE user_id IS NOT NULL
+        ''')
+        await db.execute('DROP TABLE seen_items_old')
     
-    async def get_user_settings(self, user_id: int) -> Optional[UserSettings]:
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('SELECT settings FROM users WHERE user_id = ?', (user_id,))
-            row = await cursor.fetchone()
-            
-            if not row:
-                return None
-            
-            data = json.loads(row[0])
-            return UserSettings(
+    @staticmethod
+    async def _create_users_table(db: aiosqlite.Connection, name: str):
+        await db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                user_id INTEGER PRIMARY KEY,
+                min_price INTEGER,
+                max_price INTEGER,
+                min_level INTEGER,
+                max_level INTEGER,
+                order_by TEXT NOT NULL DEFAULT 'price_to_up',
+                show TEXT NOT NULL DEFAULT 'active',
+                nsb INTEGER,
+                sb INTEGER,
+                email_login_data INTEGER,
+                pve_access TEXT,
+                notifications_enabled INTEGER NOT NULL DEFAULT 1,
+                max_discount_threshold INTEGER NOT NULL DEFAULT 20,
+                digest_enabled INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    async def _migrate_users(self, db: aiosqlite.Connection):
+        cursor = await db.execute('PRAGMA table_info(users)')
+        if 'settings' not in {row[1] for row in await cursor.fetchall()}:
+            return
+        
+        print("Миграция настроек пользователей из JSON в таблицы фильтров...")
+        await db.execute('DROP TABLE IF EXISTS users_new')
+        await self._create_users_table(db, 'users_new')
+        cursor = await db.execute('SELECT user_id, settings, created_at FROM users')
+        for user_id, raw, created_at in await cursor.fetchall():
+            await self._write_settings(db, self._decode_settings(user_id, raw), 'users_new')
+            await db.execute('UPDATE users_new SET created_at = ? WHERE user_id = ?', (created_at, user_id))
+        await db.execute('DROP TABLE users')
+        await db.execute('ALTER TABLE users_new RENAME TO users')
+    
+    @staticmethod
+    async def _add_user_columns(db: aiosqlite.Connection):
+        cursor = await db.execute('PRAGMA table_info(users)')
+        if 'digest_enabled' not in {row[1] for row in await cursor.fetchall()}:
+            await db.execute('ALTER TABLE users ADD COLUMN digest_enabled INTEGER NOT NULL DEFAULT 0')
+    
+    async def _write_settings(self, db: aiosqlite.Connection, settings: UserSettings, table: str = 'users'):
+        row = self._settings_row(settings)
+        await db.execute(f'''
+            INSERT INTO {table} (user_id, {', '.join(self.USER_COLUMNS)}, updated_at)
+            VALUES (?, {', '.join('?' * len(self.USER_COLUMNS))}, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in self.USER_COLUMNS)},
+                updated_at = CURRENT_TIMESTAMP
+        ''', (settings.user_id, *row))
+        
+        values = {
+            'user_categories': settings.categories,
+            'user_versions': settings.game_versions,
+            'user_regions': settings.regions,
+            'user_origins': settings.origins
+        }
+        for name, column in self.FILTER_TABLES.items():
+            await db.execute(f'DELETE FROM {name} WHERE user_id = ?', (settings.user_id,))
+            items = list(dict.fromkeys(values[name] or []))
+            if name == 'user_categories':
+                await db.executemany(
+                    f'INSERT INTO {name} (user_id, {column}, position) VALUES (?, ?, ?)',
+                    [(settings.user_id, item, position) for position, item in enumerate(items)]
+                )
+            else:
+                await db.executemany(
+                    f'INSERT INTO {name} (user_id, {column}) VALUES (?, ?)',
+                    [(settings.user_id, item) for item in items]
+                )
+    
+    async def _load_settings(self, db: aiosqlite.Connection, where: str = '', params: tuple = ()) -> List[UserSettings]:
+        cursor = await db.execute(f'SELECT user_id, {", ".join(self.USER_COLUMNS)} FROM users {where}', params)
+        rows = await cursor.fetchall()
+        if not rows:
+            return []
+        
+        lists = {name: {} for name in self.FILTER_TABLES}
+        for name, column in self.FILTER_TABLES.items():
+            order = 'position' if name == 'user_categories' else column
+            cursor = await db.execute(f'''
+                SELECT user_id, {column} FROM {name}
+                WHERE user_id IN (SELECT user_id FROM users {where})
+                ORDER BY user_id, {order}
+            ''', params)
+            target = lists[name]
+            for user_id, value in await cursor.fetchall():
+                target.setdefault(user_id, []).append(value)
+        
+        result = []
+        for user_id, *values in rows:
+            data = dict(zip(self.USER_COLUMNS, values))
+            settings = UserSettings(
                 user_id=user_id,
-                categories=data.get('categories', []),
-                min_price=data.get('min_price'),
-                max_price=data.get('max_price'),
-                game_versions=data.get('game_versions', []),
-                regions=data.get('regions', []),
-                origins=data.get('origins', []),
-                min_level=data.get('min_level'),
-                max_level=data.get('max_level'),
-                order_by=data.get('order_by', 'price_to_up'),
-                show=data.get('show', 'active'),
-                nsb=data.get('nsb'),
-                sb=data.get('sb'),
-                email_login_data=data.get('email_login_data'),
-                pve_access=data.get('pve_access'),
-                notifications_enabled=data.get('notifications_enabled', True),
-                max_discount_threshold=data.get('max_discount_threshold', 20)
+                categories=lists['user_categories'].get(user_id, []),
+                min_price=data['min_price'],
+                max_price=data['max_price'],
+                game_versions=lists['user_versions'].get(user_id, []),
+                regions=lists['user_regions'].get(user_id, []),
+                origins=lists['user_origins'].get(user_id, []),
+                min_level=data['min_level'],
+                max_level=data['max_level'],
+                order_by=data['order_by'],
+                show=data['show'],
+                nsb=self._to_bool(data['nsb']),
+                sb=self._to_bool(data['sb']),
+                email_login_data=self._to_bool(data['email_login_data']),
+                pve_access=data['pve_access'],
+                notifications_enabled=bool(data['notifications_enabled']),
+                max_discount_threshold=data['max_discount_threshold'],
+                digest_enabled=bool(data['digest_enabled'])
             )
+            self.settings_cache.set(user_id, settings)
+            result.append(self._copy_settings(settings))
+        return result
+    
+    @staticmethod
+    def _settings_row(settings: UserSettings) -> tuple:
+        return (
+            settings.min_price,
+            settings.max_price,
+            settings.min_level,
+            settings.max_level,
+            settings.order_by,
+            settings.show,
+            settings.nsb,
+            settings.sb,
+            settings.email_login_data,
+            settings.pve_access,
+            settings.notifications_enabled,
+            settings.max_discount_threshold,
+            settings.digest_enabled
+        )
+    
+    @staticmethod
+    def _to_bool(value: Optional[int]) -> Optional[bool]:
+        return None if value is None else bool(value)
+    
+    @staticmethod
+    async def _create_notifications_table(db: aiosqlite.Connection, name: str):
+        await db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                price INTEGER NOT NULL DEFAULT 0,
+                score INTEGER NOT NULL DEFAULT 0,
+                category TEXT NOT NULL DEFAULT '',
+                sent_at INTEGER NOT NULL,
+                message BLOB,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        ''')
+    
+    async def _migrate_notifications(self, db: aiosqlite.Connection):
+        cursor = await db.execute('PRAGMA table_info(notifications)')
+        columns = {row[1] for row in await cursor.fetchall()}
+        if not columns or 'price' in columns:
+            return
+        
+        if self.store_notification_text:
+            print("Миграция истории уведомлений в компактный формат (тексты сжимаются)...")
+        else:
+            print("Миграция истории уведомлений в компактный формат: тексты сообщений будут удалены "
+                  "(notification_store_text выключен)...")
+        await db.execute('DROP TABLE IF EXISTS notifications_new')
+        await self._create_notifications_table(db, 'notifications_new')
+        cursor = await db.execute('''
+            SELECT id, user_id, item_id, message,
+                   CAST(strftime('%s', COALESCE(sent_at, CURRENT_TIMESTAMP)) AS INTEGER)
+            FROM notifications WHERE user_id IS NOT NULL AND item_id IS NOT NULL
+        ''')
+        unparsed = 0
+        while rows := await cursor.fetchmany(self.MAX_VARIABLES):
+            migrated = []
+            for notification_id, user_id, item_id, message, sent_at in rows:
+                price, score, category = self._parse_legacy_message(message or '')
+                unparsed += not category
+                text = zlib.compress(message.encode('utf-8')) if message and self.store_notification_text else None
+                migrated.append((notification_id, user_id, item_id, price, score, category, sent_at, text))
+            await db.executemany('''
+                INSERT INTO notifications_new (id, user_id, item_id, price, score, category, sent_at, message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', migrated)
+        if unparsed:
+            print(f"Не удалось разобрать цену и категорию у {unparsed} уведомлений")
+        await self._rollup_existing(db, 'notifications_new')
+        await db.execute('DROP TABLE notifications')
+        await db.execute('ALTER TABLE notifications_new RENAME TO notifications')
+    
+    @staticmethod
+    def _parse_legacy_message(message: str) -> Tuple[int, int, str]:
+        price = re.search(r'<b>Цена:</b> ([\d,]+)', message)
+        score = re.search(r'<b>Оценка:</b> ([\d.]+)', message)
+        name = re.search(r'<b>([^<]+)</b>\n<b>Цена:', message)
+        category = next((cat for cat, info in CATEGORIES.items() if name and info['name'] == name.group(1)), '')
+        return (
+            int(price.group(1).replace(',', '')) if price else 0,
+            int(round(float(score.group(1)))) if score else 0,
+            category
+        )
+    
+    @staticmethod
+    async def _rollup_existing(db: aiosqlite.Connection, table: str):
+        day = "date(sent_at, 'unixepoch')"
+        await db.execute(f'''
+            INSERT OR REPLACE INTO notification_daily
+                (day, category, notifications, price_sum, score_sum, min_price, max_price)
+            SELECT {day}, category, COUNT(*), SUM(price), SUM(score), MIN(price), MAX(price)
+            FROM {table} GROUP BY 1, 2
+        ''')
+        await db.execute(f'''
+            INSERT OR REPLACE INTO notification_daily_users (day, category, user_id, notifications)
+            SELECT {day}, category, user_id, COUNT(*) FROM {table} GROUP BY 1, 2, 3
+        ''')
+    
+    @staticmethod
+    async def _rollup_notifications(db: aiosqlite.Connection, rows: List[tuple]):
+        if not rows:
+            return
+        
+        per_user: Dict[Tuple[str, str, int], int] = {}
+        per_category: Dict[Tuple[str, str], List[int]] = {}
+        for user_id, _, price, score, category, sent_at, _ in rows:
+            day = time.strftime('%Y-%m-%d', time.gmtime(sent_at))
+            key = (day, category, user_id)
+            per_user[key] = per_user.get(key, 0) + 1
+            stats = per_category.setdefault((day, category), [0, 0, 0, price, price])
+            stats[0] += 1
+            stats[1] += price
+            stats[2] += score
+            stats[3] = min(stats[3], price)
+            stats[4] = max(stats[4], price)
+        
+        await db.executemany('''
+            INSERT INTO notification_daily_users (day, category, user_id, notifications) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, category, user_id) DO UPDATE SET notifications = notifications + excluded.notifications
+        ''', [(*key, count) for key, count in per_user.items()])
+        await db.executemany('''
+            INSERT INTO notification_daily (day, category, notifications, price_sum, score_sum, min_price, max_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, category) DO UPDATE SET
+                notifications = notifications + excluded.notifications,
+                price_sum = price_sum + excluded.price_sum,
+                score_sum = score_sum + excluded.score_sum,
+                min_price = MIN(min_price, excluded.min_price),
+                max_price = MAX(max_price, excluded.max_price)
+        ''', [(*key, *stats) for key, stats in per_category.items()])
+    
+    async def save_user_settings(self, user_id: int, settings: UserSettings):
+        settings = replace(
+            settings,
+            user_id=user_id,
+            categories=list(settings.categories),
+            game_versions=list(settings.game_versions or []),
+            regions=list(settings.regions or []),
+            origins=list(settings.origins or [])
+        )
+        async with self._db() as db:
+            try:
+                await self._write_settings(db, settings)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        self.settings_cache.set(user_id, settings)
+        for listener in self.settings_listeners:
+            listener(self._copy_settings(settings))
+    
+    def add_settings_listener(self, listener: Callable[[UserSettings], None]):
+        self.settings_listeners.append(listener)
+    
+    async def get_user_settings(self, user_id: int) -> Optional[UserSettings]:
+        cached = self.settings_cache.get(user_id)
+        if cached is not None:
+            return self._copy_settings(cached)
+        
+        async with self._db() as db:
+            found = await self._load_settings(db, 'WHERE user_id = ?', (user_id,))
+        return found[0] if found else None
+    
+    async def get_all_active_settings(self) -> List[UserSettings]:
+        async with self._db() as db:
+            return await self._load_settings(db, 'WHERE notifications_enabled = 1')
+    
+    async def get_active_categories(self) -> List[str]:
+        async with self._db() as db:
+            cursor = await db.execute('''
+                SELECT DISTINCT c.category FROM user_categories c
+                JOIN users u ON u.user_id = c.user_id
+                WHERE u.notifications_enabled = 1
+                ORDER BY c.category
+            ''')
+            return [row[0] for row in await cursor.fetchall()]
+    
+    async def get_category_subscribers(self, category: str, price: Optional[int] = None) -> List[UserSettings]:
+        where = '''
+            WHERE notifications_enabled = 1
+            AND user_id IN (SELECT user_id FROM user_categories WHERE category = ?)
+        '''
+        params: tuple = (category,)
+        if price is not None:
+            where += ' AND COALESCE(min_price, 0) <= ? AND (max_price IS NULL OR max_price = 0 OR max_price >= ?)'
+            params += (price, price)
+        async with self._db() as db:
+            return await self._load_settings(db, where, params)
+    
+    @staticmethod
+    def _decode_settings(user_id: int, raw: str) -> UserSettings:
+        data = json.loads(raw)
+        return UserSettings(
+            user_id=user_id,
+            categories=data.get('categories', []),
+            min_price=data.get('min_price'),
+            max_price=data.get('max_price'),
+            game_versions=data.get('game_versions', []),
+            regions=data.get('regions', []),
+            origins=data.get('origins', []),
+            min_level=data.get('min_level'),
+            max_level=data.get('max_level'),
+            order_by=data.get('order_by', 'price_to_up'),
+            show=data.get('show', 'active'),
+            nsb=data.get('nsb'),
+            sb=data.get('sb'),
+            email_login_data=data.get('email_login_data'),
+            pve_access=data.get('pve_access'),
+            notifications_enabled=data.get('notifications_enabled', True),
+            max_discount_threshold=data.get('max_discount_threshold', 20),
+            digest_enabled=data.get('digest_enabled', False)
+        )
+    
+    @staticmethod
+    def _copy_settings(settings: UserSettings) -> UserSettings:
+        return replace(
+            settings,
+            categories=list(settings.categories),
+            game_versions=list(settings.game_versions) if settings.game_versions is not None else None,
+            regions=list(settings.regions) if settings.regions is not None else None,
+            origins=list(settings.origins) if settings.origins is not None else None
+        )
     
     async def get_all_users(self) -> List[int]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._db() as db:
             cursor = await db.execute('SELECT user_id FROM users')
             rows = await cursor.fetchall()
             return [row[0] for row in rows]
     
     async def mark_item_seen(self, user_id: int, item_id: int):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('INSERT OR IGNORE INTO seen_items (item_id, user_id) VALUES (?, ?)', (item_id, user_id))
-            await db.commit()
+        self._pending_seen[(user_id, item_id)] = None
+        self.seen_filter.add(user_id, item_id)
+        if len(self._pending_seen) >= self.flush_rows:
+            await self.flush()
     
     async def is_item_seen(self, user_id: int, item_id: int) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('SELECT 1 FROM seen_items WHERE item_id = ? AND user_id = ?', (item_id, user_id))
+        if not self.seen_filter.might_contain(user_id, item_id):
+            return False
+        if (user_id, item_id) in self._pending_seen:
+            return True
+        async with self._db() as db:
+            cursor = await db.execute('SELECT 1 FROM seen_items WHERE user_id = ? AND item_id = ?', (user_id, item_id))
             return await cursor.fetchone() is not None
     
-    async def save_notification(self, user_id: int, item_id: int, message: str):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('INSERT INTO notifications (user_id, item_id, message) VALUES (?, ?, ?)', (user_id, item_id, message))
-            await db.commit()
+    async def filter_unseen(self, user_id: int, item_ids: List[int]) -> List[int]:
+        if not item_ids:
+            return []
+        
+        candidates = [item_id for item_id in item_ids if self.seen_filter.might_contain(user_id, item_id)]
+        if not candidates:
+            return list(item_ids)
+        
+        seen = {item_id for item_id in candidates if (user_id, item_id) in self._pending_seen}
+        candidates = [item_id for item_id in candidates if item_id not in seen]
+        async with self._db() as db:
+            for start in range(0, len(candidates), self.MAX_VARIABLES):
+                chunk = candidates[start:start + self.MAX_VARIABLES]
+                cursor = await db.execute(
+                    f"SELECT item_id FROM seen_items WHERE user_id = ? AND item_id IN ({','.join('?' * len(chunk))})",
+                    (user_id, *chunk)
+                )
+                seen.update(row[0] for row in await cursor.fetchall())
+        return [item_id for item_id in item_ids if item_id not in seen]
+    
+    async def save_notification(self, user_id: int, item_id: int, price: int, score: float,
+                                category: str, message: Optional[str] = None):
+        text = zlib.compress(message.encode('utf-8')) if message and self.store_notification_text else None
+        self._pending_notifications.append(
+            (user_id, item_id, int(price), int(round(score)), category or '', int(time.time()), text)
+        )
+        if len(self._pending_notifications) >= self.flush_rows:
+            await self.flush()
     
     async def cleanup_old_seen_items(self, days: int = 7):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._db() as db:
             await db.execute(f"DELETE FROM seen_items WHERE seen_at < datetime('now', '-{days} days')")
             await db.commit()
+        await self.rebuild_seen_filter()
+    
+    async def cleanup_old_notifications(self, days: int = 30, batch_size: int = 500) -> int:
+        cutoff = int(time.time()) - days * 86400
+        deleted = 0
+        while True:
+            async with self._db() as db:
+                cursor = await db.execute('''
+                    DELETE FROM notifications WHERE id IN (
+                        SELECT id FROM notifications WHERE sent_at < ? ORDER BY sent_at LIMIT ?
+                    )
+                ''', (cutoff, batch_size))
+                await db.commit()
+                count = cursor.rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+            await asyncio.sleep(0)
+    
+    async def get_notification_text(self, notification_id: int) -> Optional[str]:
+        async with self._db() as db:
+            cursor = await db.execute('SELECT message FROM notifications WHERE id = ?', (notification_id,))
+            row = await cursor.fetchone()
+        if not row or row[0] is None:
+            return None
+        return zlib.decompress(row[0]).decode('utf-8')
+    
+    async def get_notification_stats(self, days: int = 30) -> List[Tuple[str, str, int, int, float, float]]:
+        async with self._db() as db:
+            cursor = await db.execute('''
+                SELECT d.day, d.category, d.notifications,
+                       (SELECT COUNT(*) FROM notification_daily_users u WHERE u.day = d.day AND u.category = d.category),
+                       CAST(d.price_sum AS REAL) / d.notifications, CAST(d.score_sum AS REAL) / d.notifications
+                FROM notification_daily d
+                WHERE d.day >= date('now', ?) AND d.notifications > 0
+                ORDER BY d.day, d.category
+            ''', (f'-{days} days',))
+            return list(await cursor.fetchall())
+    
+    async def get_watermarks(self) -> Dict[str, Tuple[int, int]]:
+        async with self._db() as db:
+            cursor = await db.execute('SELECT query_key, published_date, item_id FROM watermarks')
+            rows = await cursor.fetchall()
+            return {row[0]: (row[1], row[2]) for row in rows}
+    
+    async def save_watermarks(self, marks: Dict[str, Tuple[int, int]]):
+        if not marks:
+            return
+        async with self._db() as db:
+            await db.executemany('''
+                INSERT OR REPLACE INTO watermarks (query_key, published_date, item_id, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', [(key, mark[0], mark[1]) for key, mark in marks.items()])
+            await db.commit()
+    
+    async def cleanup_old_watermarks(self, days: int = 7):
+        async with self._db() as db:
+            await db.execute(f"DELETE FROM watermarks WHERE updated_at < datetime('now', '-{days} days')")
+            await db.commit()
+    
+    async def get_price_index(self) -> Dict[str, str]:
+        async with self._db() as db:
+            cursor = await db.execute('SELECT bucket, state FROM price_index')
+            rows = await cursor.fetchall()
+            return {row[0]: row[1] for row in rows}
+    
+    async def save_price_index(self, rows: Dict[str, str]):
+        if not rows:
+            return
+        async with self._db() as db:
+            await db.executemany('''
+                INSERT OR REPLACE INTO price_index (bucket, state, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', list(rows.items()))
+            await db.commit()
+    
+    async def heartbeat_worker(self, worker_id: str, pid: int):
+        async with self._db() as db:
+            await db.execute('''
+                INSERT INTO workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET pid = excluded.pid, heartbeat_at = excluded.heartbeat_at
+            ''', (worker_id, pid, time.time()))
+            await db.commit()
+    
+    async def get_live_workers(self, lease_seconds: float) -> List[str]:
+        async with self._db() as db:
+            cursor = await db.execute(
+                'SELECT worker_id FROM workers WHERE heartbeat_at >= ? ORDER BY worker_id',
+                (time.time() - lease_seconds,)
+            )
+            return [row[0] for row in await cursor.fetchall()]
+    
+    async def release_worker(self, worker_id: str):
+        async with self._db() as db:
+            await db.execute('DELETE FROM workers WHERE worker_id = ?', (worker_id,))
+            await db.commit()
@@ -233,6 +233,7 @@ async def handle_region(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "settings_complete")
 async def complete_settings(callback: CallbackQuery, state: FSMContext, db: Database):
     data = await state.get_data()
+    current = await db.get_user_settings(callback.from_user.id)
     
     settings = UserSettings(
         user_id=callback.from_user.id,
@@ -250,7 +251,8 @@ async def complete_settings(callback: CallbackQuery, state: FSMContext, db: Data
         sb=data.get("sb"),
         email_login_data=data.get("email_login_data"),
         pve_access=data.get("pve_access"),
-        max_discount_threshold=data.get("max_discount_threshold", 20)
+        max_discount_threshold=data.get("max_discount_threshold", 20),
+        digest_enabled=current.digest_enabled if current else False
     )
     
     await db.save_user_settings(callback.from_user.id, settings)
@@ -328,6 +330,7 @@ async def view_settings(callback: CallbackQuery, db: Database):
         text += f"<b>Издания:</b> {', '.join(versions)}\n\n"
     
     text += f"<b>Уведомления:</b> {'включены' if settings.notifications_enabled else 'выключены'}\n"
+    text += f"<b>Дайджест:</b> {'включен' if settings.digest_enabled else 'выключен'}\n"
     text += f"<b>Мин. скидка:</b> {settings.max_discount_threshold}%"
     
     await callback.message.edit_text(text, reply_markup=get_main_kb(), parse_mode="HTML")
@@ -353,6 +356,25 @@ async def toggle_notif(callback: CallbackQuery, db: Database):
         pass
 
 
+@router.callback_query(F.data == "toggle_digest")
+async def toggle_digest(callback: CallbackQuery, db: Database):
+    settings = await db.get_user_settings(callback.from_user.id)
+    if not settings:
+        await callback.answer("Настройки не найдены", show_alert=True)
+        return
+    
+    settings.digest_enabled = not settings.digest_enabled
+    await db.save_user_settings(callback.from_user.id, settings)
+    
+    status = "включен" if settings.digest_enabled else "выключен"
+    await callback.answer(f"Дайджест {status}")
+    
+    try:
+        await callback.message.edit_reply_markup(reply_markup=get_main_kb())
+    except:
+        pass
+
+
 @router.callback_query(F.data == "view_stats")
 async def view_stats(callback: CallbackQuery, db: Database):
     try:
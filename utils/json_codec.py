@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+Decoder = Callable[[bytes], Iterable[Dict[str, Any]]]
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_items(data: Union[bytes, str], key: str = 'items') -> Iterator[Dict[str, Any]]:
+    text = data.decode('utf-8') if isinstance(data, (bytes, bytearray)) else data
+    pos = _skip(text, 0)
+    _expect(text, pos, '{')
+    pos = _skip(text, pos + 1)
+    if text[pos] == '}':
+        return
+
+    while True:
+        name, pos = _decoder.raw_decode(text, pos)
+        pos = _skip(text, pos)
+        _expect(text, pos, ':')
+        pos = _skip(text, pos + 1)
+
+        if name == key and text[pos] == '[':
+            yield from _iter_array(text, pos)
+            return
+
+        _, pos = _decoder.raw_decode(text, pos)
+        pos = _skip(text, pos)
+        if text[pos] == '}':
+            return
+        _expect(text, pos, ',')
+        pos = _skip(text, pos + 1)
+
+
+def _iter_array(text: str, pos: int) -> Iterator[Any]:
+    pos = _skip(text, pos + 1)
+    if text[pos] == ']':
+        return
+    while True:
+        value, pos = _decoder.raw_decode(text, pos)
+        yield value
+        pos = _skip(text, pos)
+        if text[pos] == ']':
+            return
+        _expect(text, pos, ',')
+        pos = _skip(text, pos + 1)
+
+
+def _skip(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _expect(text: str, pos: int, char: str):
+    if pos >= len(text) or text[pos] != char:
+        raise ValueError(f"Expected {char!r} at position {pos}")
+
+
+def _decode_full(data: bytes) -> Iterable[Dict[str, Any]]:
+    return loads(data).get('items', [])
+
+
+def _decode_stdlib(data: bytes) -> Iterable[Dict[str, Any]]:
+    return json.loads(data).get('items', [])
+
+
+DECODERS: Dict[str, Decoder] = {
+    "orjson": _decode_full,
+    "json": _decode_stdlib,
+    "stream": iter_items
+}
+
+
+def get_decoder(name: str = "auto") -> Decoder:
+    if name == "auto":
+        return _decode_full
+    if name == "orjson" and orjson is None:
+        print("orjson не установлен, используется стандартный json")
+        return _decode_stdlib
+    return DECODERS[name]
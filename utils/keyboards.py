@@ -150,6 +150,7 @@ def get_main_kb() -> InlineKeyboardMarkup:
         ("Настройки", "open_settings"),
         ("Мои настройки", "view_settings"),
         ("Уведомления", "toggle_notifications"),
+        ("Дайджест", "toggle_digest"),
         ("Статистика", "view_stats")
     ]
     
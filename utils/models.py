@@ -53,9 +53,10 @@ class UserSettings:
     pve_access: Optional[str] = None
     notifications_enabled: bool = True
     max_discount_threshold: int = 20
+    digest_enabled: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class TarkovAccount:
     item_id: int
     title: str
@@ -88,6 +89,7 @@ class DealAlert:
     reason: str
     score: float
     discount_potential: int
+    category: str = ""
 
 
 CATEGORIES = {
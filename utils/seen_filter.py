@@ -0,0 +1,87 @@
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    __slots__ = ("capacity", "size", "hashes", "bits", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key: int):
+        h = _mix(key)
+        h1, h2, size, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.size, self.bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        h = _mix(key)
+        h1, h2, size, bits = h & 0xFFFFFFFF, (h >> 32) | 1, self.size, self.bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class SeenFilter:
+    def __init__(self, fp_rate: float = 0.01, capacity: int = 1000):
+        self.fp_rate = fp_rate
+        self.capacity = capacity
+        self.filters: Dict[int, List[BloomFilter]] = {}
+
+    def add(self, user_id: int, item_id: int):
+        layers = self.filters.get(user_id)
+        if layers is None:
+            layers = self.filters[user_id] = [BloomFilter(self.capacity, self.fp_rate)]
+        layer = layers[-1]
+        if layer.count >= layer.capacity:
+            layer = BloomFilter(layer.capacity * 2, self.fp_rate / 2 ** len(layers))
+            layers.append(layer)
+        layer.add(item_id)
+
+    def might_contain(self, user_id: int, item_id: int) -> bool:
+        layers = self.filters.get(user_id)
+        if not layers:
+            return False
+        return any(item_id in layer for layer in layers)
+
+    def rebuild(self, rows: Iterable[Tuple[int, int]]):
+        self.filters = {}
+        for user_id, item_id in rows:
+            self.add(user_id, item_id)
+
+    def discard(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            self.filters.pop(user_id, None)
+
+    def reload(self, user_ids: Iterable[int], rows: Iterable[Tuple[int, int]]):
+        self.discard(user_ids)
+        for user_id, item_id in rows:
+            self.add(user_id, item_id)
+
+    def memory_bytes(self) -> int:
+        return sum(len(layer.bits) for layers in self.filters.values() for layer in layers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.filters),
+            "items": sum(layer.count for layers in self.filters.values() for layer in layers),
+            "memory_bytes": self.memory_bytes(),
+            "fp_rate": self.fp_rate
+        }